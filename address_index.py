@@ -0,0 +1,356 @@
+"""
+Offline address index for geocoding without network access.
+
+The index is a single binary file built from an address/postcode CSV
+extract (e.g. OpenAddresses). It contains fixed-size records sorted by
+"postcode|street|house number" plus a second permutation sorted by
+"street|house number|postcode" for queries without a postcode. At
+runtime the file is memory-mapped and searched with binary search, so
+lookups take a few microseconds and the dataset is never loaded into
+Python objects. Only unambiguous matches are reported as "exact"; closest
+house numbers and street name prefixes are returned as suggestions.
+
+Build an index:
+
+    python address_index.py build addresses.csv addresses.idx
+
+Query it:
+
+    python address_index.py query addresses.idx "Musterstraße 1, 12345 Musterstadt"
+"""
+
+import argparse
+import csv
+import mmap
+import re
+import struct
+import sys
+
+from geocode_cache import normalize_address
+
+MAGIC = b"HPADDR02"
+# magic, record count, key size, label section offset
+HEADER = struct.Struct("<8sIII")
+KEY_SIZE = 96
+# key, latitude, longitude, label offset, label length, city offset, city length, house number
+RECORD = struct.Struct(f"<{KEY_SIZE}sddIIIII")
+SECONDARY = struct.Struct("<I")
+
+# Spaltennamen, die im CSV-Extrakt akzeptiert werden
+COLUMN_ALIASES = {
+    "street": ("street", "strasse", "straße"),
+    "housenumber": ("housenumber", "number", "hausnummer", "house_number"),
+    "postcode": ("postcode", "plz", "postal_code", "zip"),
+    "city": ("city", "ort", "stadt"),
+    "lat": ("lat", "latitude", "breitengrad"),
+    "lon": ("lon", "lng", "longitude", "laengengrad"),
+}
+
+_POSTCODE = re.compile(r"^\d{5}$")
+_HOUSENUMBER = re.compile(r"^\d{1,4}[a-z]?$")
+
+
+def _housenumber_key(housenumber):
+    # Zero padding keeps house numbers in numeric order: 2 < 10 < 10a
+    match = re.match(r"^(\d+)(.*)$", housenumber)
+    if not match:
+        return housenumber
+    return f"{int(match.group(1)):05d}{match.group(2)}"
+
+
+def _housenumber_value(key):
+    match = re.match(r"^(\d+)", key)
+    return int(match.group(1)) if match else 0
+
+
+def _encode_key(text):
+    # Nie kürzen: ein abgeschnittener Schlüssel würde auf fremde Adressen passen
+    return text.encode("utf-8")
+
+
+def parse_address(address):
+    """
+    Split a free-form German address into (street, house number, postcode, city).
+
+    Missing parts are returned as empty strings.
+    """
+    tokens = normalize_address(address).split()
+    postcode_index = next((i for i, t in enumerate(tokens) if _POSTCODE.match(t)), None)
+    number_index = next(
+        (i for i, t in enumerate(tokens) if i != postcode_index and _HOUSENUMBER.match(t)),
+        None,
+    )
+
+    postcode = tokens[postcode_index] if postcode_index is not None else ""
+    if number_index is None:
+        # Ohne Hausnummer: Straße steht vor der Postleitzahl bzw. ist die ganze Eingabe
+        end = postcode_index if postcode_index else len(tokens)
+        city = " ".join(tokens[end + 1:]) if postcode_index else ""
+        return " ".join(tokens[:end]), "", postcode, city
+
+    start = 0
+    if postcode_index is not None and postcode_index < number_index:
+        # "12345 Musterstadt, Musterstraße 1": Ort folgt auf die Postleitzahl
+        start = postcode_index + 2
+        city = " ".join(tokens[postcode_index + 1:start])
+    else:
+        # "Musterstraße 1, 12345 Musterstadt" bzw. "Musterstraße 1, Musterstadt"
+        city = " ".join(
+            t for i, t in enumerate(tokens) if i > number_index and i != postcode_index
+        )
+    street = " ".join(tokens[start:number_index])
+    return street, _housenumber_key(tokens[number_index]), postcode, city
+
+
+def _resolve_columns(fieldnames):
+    lowered = {name.strip().lower(): name for name in fieldnames}
+    columns = {}
+    for column, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in lowered:
+                columns[column] = lowered[alias]
+                break
+        else:
+            if column != "city":
+                raise ValueError(f"Spalte '{column}' fehlt im CSV-Extrakt")
+    return columns
+
+
+def build_index(csv_path, index_path, delimiter=","):
+    """
+    Build an index file from a CSV extract.
+
+    Rows without coordinates and rows whose key does not fit into KEY_SIZE
+    bytes are skipped; for duplicate keys the first row wins. Returns the
+    number of records written and the number of rows skipped for their
+    key length.
+    """
+    entries = {}
+    too_long = 0
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f, delimiter=delimiter)
+        columns = _resolve_columns(reader.fieldnames or [])
+        for row in reader:
+            try:
+                lat = float(row[columns["lat"]])
+                lon = float(row[columns["lon"]])
+            except (TypeError, ValueError):
+                continue
+            street = normalize_address(row[columns["street"]])
+            housenumber = _housenumber_key(normalize_address(row[columns["housenumber"]]).replace(" ", ""))
+            postcode = row[columns["postcode"]].strip()
+            if not street or not postcode:
+                continue
+            city = row[columns["city"]].strip() if "city" in columns else ""
+            label = f"{row[columns['street']].strip()} {row[columns['housenumber']].strip()}, {postcode} {city}".strip()
+            key = _encode_key(f"{postcode}|{street}|{housenumber}")
+            if len(key) > KEY_SIZE:
+                too_long += 1
+                continue
+            entries.setdefault(key, (street, housenumber, postcode, lat, lon, label, normalize_address(city)))
+
+    keys = sorted(entries)
+    secondary = sorted(
+        range(len(keys)),
+        key=lambda i: _encode_key("{0}|{1}|{2}".format(*entries[keys[i]][:3])),
+    )
+
+    labels = bytearray()
+    records = bytearray()
+    for key in keys:
+        _, housenumber, _, lat, lon, label, city = entries[key]
+        encoded_label = label.encode("utf-8")
+        encoded_city = city.encode("utf-8")
+        records += RECORD.pack(
+            key, lat, lon,
+            len(labels), len(encoded_label),
+            len(labels) + len(encoded_label), len(encoded_city),
+            _housenumber_value(housenumber),
+        )
+        labels += encoded_label + encoded_city
+
+    secondary_bytes = b"".join(SECONDARY.pack(i) for i in secondary)
+    labels_offset = HEADER.size + len(records) + len(secondary_bytes)
+    with open(index_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(keys), KEY_SIZE, labels_offset))
+        f.write(records)
+        f.write(secondary_bytes)
+        f.write(labels)
+    return len(keys), too_long
+
+
+class AddressIndex:
+    """
+    Read-only, memory-mapped view of an index file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, key_size, self._labels_offset = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or key_size != KEY_SIZE:
+            raise ValueError(f"{path} ist keine gültige Adressindex-Datei")
+        self._records_offset = HEADER.size
+        self._secondary_offset = HEADER.size + self.count * RECORD.size
+
+    def close(self):
+        self._mm.close()
+
+    def _key(self, i):
+        start = self._records_offset + i * RECORD.size
+        return self._mm[start:start + KEY_SIZE].rstrip(b"\0")
+
+    def _primary_key(self, i):
+        return self._key(i), i
+
+    def _secondary_key(self, j):
+        # "street|house number|postcode" aus dem Primärschlüssel zusammensetzen
+        (i,) = SECONDARY.unpack_from(self._mm, self._secondary_offset + j * SECONDARY.size)
+        postcode, street, housenumber = self._key(i).split(b"|", 2)
+        return b"|".join((street, housenumber, postcode)), i
+
+    def _fields(self, i):
+        return RECORD.unpack_from(self._mm, self._records_offset + i * RECORD.size)
+
+    def _city(self, i):
+        city_offset, city_length = self._fields(i)[5:7]
+        start = self._labels_offset + city_offset
+        return self._mm[start:start + city_length].decode("utf-8")
+
+    def _city_matches(self, i, city):
+        # "frankfurt" passt auch auf "frankfurt am main"; ohne Ort im Extrakt nie
+        indexed = self._city(i)
+        return bool(indexed) and (indexed == city or indexed.startswith(city + " "))
+
+    def _record(self, i):
+        key, lat, lon, label_offset, label_length = self._fields(i)[:5]
+        start = self._labels_offset + label_offset
+        return {
+            "key": key.rstrip(b"\0").decode("utf-8", "replace"),
+            "latitude": lat,
+            "longitude": lon,
+            "address": self._mm[start:start + label_length].decode("utf-8"),
+        }
+
+    def _lower_bound(self, prefix, key_at):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if key_at(mid)[0] < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _scan(self, prefix, key_at, limit):
+        """Yield (key, record number) pairs whose key starts with `prefix`."""
+        position = self._lower_bound(prefix, key_at)
+        while position < self.count and limit > 0:
+            key, i = key_at(position)
+            if not key.startswith(prefix):
+                return
+            yield key, i
+            position += 1
+            limit -= 1
+
+    def prefix_search(self, prefix, limit=20, by_street=False):
+        """
+        Return up to `limit` records whose key starts with `prefix`.
+
+        Keys are "postcode|street|house number", or "street|house number|postcode"
+        with `by_street=True`.
+        """
+        key_at = self._secondary_key if by_street else self._primary_key
+        return [self._record(i) for _, i in self._scan(_encode_key(prefix), key_at, limit)]
+
+    def _closest(self, candidates, housenumber, city):
+        """Candidate with the house number closest to `housenumber`, preferring the given city."""
+        if city:
+            candidates = [i for i in candidates if self._city_matches(i, city)] or candidates
+        wanted = _housenumber_value(housenumber)
+        return min(candidates, key=lambda i: abs(self._fields(i)[7] - wanted))
+
+    def lookup(self, address):
+        """
+        Find `address` in the index.
+
+        Returns a result dict or None. `match` is
+        - "exact": the street and house number exist with the given postcode,
+          or (without postcode) in exactly one town that also matches the
+          given city, if any,
+        - "ambiguous": they exist in several towns and no postcode/city decides,
+        - "street": the closest house number in the same street,
+        - "prefix": a street starting with the given street name.
+        Only "exact" is a reliable location; the others are suggestions.
+        """
+        street, housenumber, postcode, city = parse_address(address)
+        if not street:
+            return None
+
+        if postcode:
+            key_at = self._primary_key
+            exact = f"{postcode}|{street}|{housenumber}"
+            same_street = f"{postcode}|{street}|"
+            street_prefix = f"{postcode}|{street}"
+        else:
+            key_at = self._secondary_key
+            exact = f"{street}|{housenumber}|"
+            same_street = f"{street}|"
+            street_prefix = street
+
+        if housenumber:
+            encoded = _encode_key(exact)
+            candidates = [
+                i for key, i in self._scan(encoded, key_at, 500)
+                # Mit PLZ muss der Schlüssel vollständig passen (1 ≠ 1a)
+                if not postcode or key == encoded
+            ]
+            if candidates and not postcode and city:
+                candidates = [i for i in candidates if self._city_matches(i, city)] or candidates
+                decided = len(candidates) == 1 and self._city_matches(candidates[0], city)
+            else:
+                decided = len(candidates) == 1
+            if candidates:
+                result = self._record(candidates[0])
+                result["match"] = "exact" if decided else "ambiguous"
+                return result
+
+        for prefix, match in ((same_street, "street"), (street_prefix, "prefix")):
+            candidates = [i for _, i in self._scan(_encode_key(prefix), key_at, 500)]
+            if candidates:
+                result = self._record(self._closest(candidates, housenumber, city))
+                result["match"] = match
+                return result
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline-Adressindex erstellen und abfragen")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Index aus einem CSV-Extrakt erstellen")
+    build.add_argument("csv_path")
+    build.add_argument("index_path")
+    build.add_argument("--delimiter", default=",")
+
+    query = subparsers.add_parser("query", help="Adresse im Index nachschlagen")
+    query.add_argument("index_path")
+    query.add_argument("address")
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        count, too_long = build_index(args.csv_path, args.index_path, delimiter=args.delimiter)
+        print(f"{count} Adressen in {args.index_path} geschrieben")
+        if too_long:
+            print(f"{too_long} Adressen mit mehr als {KEY_SIZE} Byte Schlüssellänge übersprungen")
+    else:
+        index = AddressIndex(args.index_path)
+        result = index.lookup(args.address)
+        print(result if result else "Adresse nicht gefunden")
+        index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+"""
+Headless batch processing of plot leads.
+
+Reads leads (address, plot size and the ten ratings) from a CSV or JSONL
+file as a stream, geocodes them in parallel through the shared, cached
+and rate-limited geocoder, and writes one result per lead incrementally
+to JSONL or to Parquet part files. Leads already present in the output
+are skipped, so an interrupted run can simply be restarted. Leads whose
+address lookup failed (rate limit, timeout, cache errors) are not written
+to the output but to a separate file, and are retried on the next run.
+
+    python batch_planner.py leads.csv ergebnisse.jsonl
+    python batch_planner.py leads.jsonl ergebnisse_parquet/ --format parquet
+
+Expected input fields: "id" (optional, defaults to the line number),
+"adresse", "grundstuecks_groesse" and "frage_1" ... "frage_10".
+"""
+
+import argparse
+import collections
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import settings
+from geocoding import build_geocoder
+from matching import DesignCatalog
+from planner_core import FRAGEN, build_answers, build_result
+
+# Ergebnisse werden blockweise gegen den Entwurfskatalog bewertet
+RECOMMENDATION_BLOCK = 256
+
+
+def read_leads(path):
+    """
+    Yield lead dicts from a CSV or JSONL file without loading it into memory.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line_number, line in enumerate(f, 1):
+                if line.strip():
+                    lead = json.loads(line)
+                    lead.setdefault("id", str(line_number))
+                    yield lead
+        else:
+            for line_number, row in enumerate(csv.DictReader(f), 2):
+                if not row.get("id"):
+                    row["id"] = str(line_number)
+                yield row
+
+
+def process_lead(geocoder, lead):
+    """
+    Geocode one lead and build its result row; invalid leads and failed
+    address lookups get an "error".
+    """
+    lead_id = str(lead["id"])
+    try:
+        antworten = build_answers([lead[f"frage_{i}"] for i in range(1, len(FRAGEN) + 1)])
+        grundstuecks_groesse = float(lead.get("grundstuecks_groesse") or 0)
+    except (KeyError, TypeError, ValueError) as e:
+        return {"id": lead_id, "adresse": lead.get("adresse"), "error": f"Ungültige Eingabe: {e}"}
+
+    adresse = (lead.get("adresse") or "").strip()
+    try:
+        location_data = geocoder.geocode(adresse) if adresse else {"found": False}
+    except Exception as e:
+        # z.B. gesperrte Cache-Datenbank: nur dieser Lead schlägt fehl, nicht der ganze Lauf
+        location_data = {"found": False, "error": str(e)}
+    result = build_result(grundstuecks_groesse, adresse, location_data, antworten)
+    result["id"] = lead_id
+    if "error" in location_data:
+        result["error"] = f"Adresssuche fehlgeschlagen: {location_data['error']}"
+    return result
+
+
+def lookup_failed(result):
+    """Whether `result` failed because of its address lookup and should be retried."""
+    return "error" in (result.get("standort") or {})
+
+
+class JsonlWriter:
+    """
+    Append results to a JSONL file, one flushed line per lead.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._repair()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _repair(self):
+        # Eine beim Abbruch halb geschriebene letzte Zeile abschneiden
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            end = data.rfind(b"\n") + 1
+            if end != len(data):
+                f.truncate(end)
+
+    def completed_ids(self):
+        ids = set()
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                ids.add(str(json.loads(line)["id"]))
+        return ids
+
+    def write(self, result):
+        self._file.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    """
+    Write results as numbered Parquet part files of `rows_per_part` rows.
+
+    Each part is written atomically, so an interrupted run loses at most
+    the rows buffered for the current part.
+    """
+
+    def __init__(self, directory, rows_per_part=1000):
+        import pyarrow  # noqa: F401  (optionale Abhängigkeit, früh prüfen)
+
+        self.directory = directory
+        self.rows_per_part = rows_per_part
+        self._rows = []
+        os.makedirs(directory, exist_ok=True)
+        self._part = len(self._parts())
+
+    def _parts(self):
+        return sorted(glob.glob(os.path.join(self.directory, "part-*.parquet")))
+
+    def completed_ids(self):
+        import pyarrow.parquet as pq
+
+        ids = set()
+        for part in self._parts():
+            ids.update(str(i) for i in pq.read_table(part, columns=["id"]).column("id").to_pylist())
+        return ids
+
+    def write(self, result):
+        # Verschachtelte Werte als JSON, damit alle Teile dasselbe Schema haben
+        self._rows.append({
+            key: json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else value
+            for key, value in result.items()
+        })
+        if len(self._rows) >= self.rows_per_part:
+            self._flush()
+
+    def _flush(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not self._rows:
+            return
+        table = pa.table({
+            column: pa.array([row.get(column) for row in self._rows], type=column_type)
+            for column, column_type in (
+                ("id", pa.string()),
+                ("adresse", pa.string()),
+                ("grundstuecks_groesse", pa.float64()),
+                ("standort", pa.string()),
+                ("bewertungen", pa.string()),
+                ("rangfolge", pa.string()),
+                ("empfehlungen", pa.string()),
+                ("error", pa.string()),
+            )
+        })
+        path = os.path.join(self.directory, f"part-{self._part:05d}.parquet")
+        pq.write_table(table, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        self._part += 1
+        self._rows = []
+
+    def close(self):
+        self._flush()
+
+
+def add_recommendations(catalog, results, k=5):
+    """
+    Attach the `k` best matching designs to each valid result, scoring all
+    results with one call of the catalog's batch API.
+    """
+    valid = [result for result in results if "error" not in result]
+    if not valid:
+        return
+    ratings = [
+        [result["bewertungen"][f"frage_{i}"] for i in range(1, len(FRAGEN) + 1)]
+        for result in valid
+    ]
+    plot_sizes = [result["grundstuecks_groesse"] for result in valid]
+    for result, empfehlungen in zip(valid, catalog.top_k_batch(ratings, plot_sizes, k)):
+        result["empfehlungen"] = empfehlungen
+
+
+def run_batch(input_path, writer, geocoder, workers=4, progress=None, catalog=None, failed_writer=None):
+    """
+    Process all leads of `input_path` not yet in `writer`'s output.
+
+    At most `workers * 4` leads are in flight, results are written in input
+    order. With a `catalog`, design recommendations are added in blocks of
+    `RECOMMENDATION_BLOCK` results. Leads whose address lookup failed are
+    kept out of `writer` (so the next run retries them) and go to
+    `failed_writer` instead, if given. Returns (processed, skipped, failed).
+    """
+    done = writer.completed_ids()
+    processed = skipped = failed = 0
+    pending = collections.deque()
+    ready = []
+
+    def write_ready():
+        if catalog is not None:
+            add_recommendations(catalog, ready)
+        for result in ready:
+            writer.write(result)
+        ready.clear()
+
+    def drain(limit):
+        nonlocal processed, failed
+        while len(pending) > limit:
+            result = pending.popleft().result()
+            processed += 1
+            if lookup_failed(result):
+                failed += 1
+                if failed_writer is not None:
+                    failed_writer.write(result)
+                continue
+            ready.append(result)
+            if catalog is None or len(ready) >= RECOMMENDATION_BLOCK:
+                write_ready()
+            if progress and processed % 100 == 0:
+                progress(processed, skipped)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as executor:
+            for lead in read_leads(input_path):
+                if str(lead["id"]) in done:
+                    skipped += 1
+                    continue
+                pending.append(executor.submit(process_lead, geocoder, lead))
+                drain(workers * 4)
+            drain(0)
+            write_ready()
+    finally:
+        writer.close()
+        if failed_writer is not None:
+            failed_writer.close()
+    return processed, skipped, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grundstücks-Leads im Batch verarbeiten")
+    parser.add_argument("input", help="CSV- oder JSONL-Datei mit Leads")
+    parser.add_argument("output", help="JSONL-Datei bzw. Verzeichnis für Parquet-Teile")
+    parser.add_argument("--format", choices=("jsonl", "parquet"), default="jsonl")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Parallele Adresssuchen (das Rate-Limit gilt trotzdem)")
+    parser.add_argument("--catalog", default=settings.DESIGN_CATALOG_PATH,
+                        help="Entwurfskatalog (.npz/.csv) für Hausempfehlungen")
+    parser.add_argument("--failed", help="JSONL-Datei für Leads mit fehlgeschlagener Adresssuche "
+                                         "(Standard: <output>.fehlgeschlagen.jsonl)")
+    args = parser.parse_args(argv)
+
+    # Mehr Worker als wartende Anfragen erlaubt würden nur "überlastet" liefern
+    workers = max(1, min(args.workers, settings.NOMINATIM_MAX_PENDING))
+    writer = JsonlWriter(args.output) if args.format == "jsonl" else ParquetWriter(args.output)
+    # Fehlgeschlagene Leads werden bei jedem Lauf erneut versucht, die Datei gilt nur für diesen Lauf
+    failed_path = args.failed or os.path.splitext(args.output.rstrip(os.sep))[0] + ".fehlgeschlagen.jsonl"
+    if os.path.exists(failed_path):
+        os.remove(failed_path)
+    failed_writer = JsonlWriter(failed_path)
+
+    started = time.monotonic()
+
+    def progress(processed, skipped):
+        rate = processed / max(time.monotonic() - started, 1e-9)
+        print(f"{processed} verarbeitet, {skipped} übersprungen ({rate:.1f}/s)", file=sys.stderr)
+
+    catalog = DesignCatalog.load(args.catalog) if args.catalog else None
+    processed, skipped, failed = run_batch(
+        args.input, writer, build_geocoder(), workers, progress, catalog, failed_writer
+    )
+    print(f"Fertig: {processed} verarbeitet, {skipped} bereits vorhanden", file=sys.stderr)
+    if failed:
+        print(f"{failed} Leads mit fehlgeschlagener Adresssuche in {failed_path}, "
+              "sie werden beim nächsten Lauf erneut versucht", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
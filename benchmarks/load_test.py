@@ -0,0 +1,363 @@
+"""
+Load test for the house planner with concurrent, scripted sessions.
+
+Each session runs house_planner.py headless through Streamlit's AppTest
+and behaves like a user: enter plot size and address, wait for the map,
+click through the ten rating questions, open the summary and confirm.
+Geocoding goes to a local stub Nominatim server with configurable
+latency, so runs are reproducible and never touch the public service.
+
+AppTest swaps a process-global runtime on every rerun, so concurrent
+sessions run in separate worker processes. Each worker runs its share
+of sessions one after another with warm in-process caches, like a
+long-running Streamlit server; the SQLite geocode cache is shared by all
+workers.
+
+    python benchmarks/load_test.py --sessions 20 --concurrency 5 \\
+        --geocode-latency 0.3 --output bench.json
+
+The JSON report holds p50/p95/p99 rerun times per interaction, geocoding
+wait times, map build times, geocode cache hit rates and memory: the
+RSS growth of each session (measured before and after it, reported
+separately for each worker's first, cold session) and the peak RSS per
+worker, also divided by the sessions it ran. Pass
+`--compare` with an earlier report to print the relative change.
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "house_planner.py")
+
+
+def start_stub_nominatim(latency):
+    """
+    Serve Nominatim-style search responses after `latency` seconds.
+    Every address is found at a position derived from its text.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            offset = (hash(self.path) % 10_000) / 100_000
+            body = json.dumps([{
+                "lat": str(52.5 + offset),
+                "lon": str(13.4 + offset),
+                "display_name": f"Stub {self.path}",
+            }]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class Recorder:
+    """Thread-safe collection of timing samples per metric."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.samples.setdefault(name, []).append(seconds)
+
+    def timed(self, name, fn, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def merge(self, samples):
+        for name, values in samples.items():
+            self.samples.setdefault(name, []).extend(values)
+
+    def summary(self):
+        return {
+            name: {
+                "count": len(values),
+                "mean_ms": float(np.mean(values) * 1000),
+                "p50_ms": float(np.percentile(values, 50) * 1000),
+                "p95_ms": float(np.percentile(values, 95) * 1000),
+                "p99_ms": float(np.percentile(values, 99) * 1000),
+            }
+            for name, values in sorted(self.samples.items())
+        }
+
+
+# Aufzeichnung der laufenden Sitzung und Anzahl bisheriger Sitzungen im Worker-Prozess
+_recorder = None
+_sessions_run = 0
+
+
+def current_rss_kib():
+    """Current resident set size of this process in KiB (Linux; elsewhere the peak)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _init_worker():
+    sys.path.insert(0, ROOT)
+    instrument()
+
+
+# Geocode-Caches des Workers; ihre Zähler werden nach jeder Sitzung übertragen, da
+# Worker-Prozesse ohne atexit-Handler beendet werden
+_geocode_caches = []
+
+
+def instrument():
+    """
+    Time geocoding and map rendering by wrapping the module functions, and
+    keep track of the worker's geocode caches.
+    """
+    import geocode_cache
+    import geocoding
+    import map_rendering
+
+    original_init = geocode_cache.GeocodeCache.__init__
+
+    def init(self, *args, **kwargs):
+        original_init(self, *args, **kwargs)
+        _geocode_caches.append(self)
+
+    geocode_cache.GeocodeCache.__init__ = init
+
+    original_geocode = geocoding.GeocodingService.geocode
+    original_render = map_rendering.render_map_html
+
+    def geocode(self, address):
+        return _recorder.timed("geocode.service", original_geocode, self, address)
+
+    def render_map_html(*args, **kwargs):
+        return _recorder.timed("map.render_html", original_render, *args, **kwargs)
+
+    geocoding.GeocodingService.geocode = geocode
+    map_rendering.render_map_html = render_map_html
+
+
+def run_session(number, seed, distinct_addresses, timeout):
+    """
+    Script one user session in a worker process.
+
+    Returns (timing samples, error message or None, memory), where memory
+    holds the worker's pid, the session's index in that worker, its RSS
+    before and after the session and the worker's peak RSS (all in KiB).
+    """
+    global _recorder, _sessions_run
+    from streamlit.testing.v1 import AppTest
+
+    memory = {"pid": os.getpid(), "index": _sessions_run, "rss_before_kib": current_rss_kib()}
+    _sessions_run += 1
+    recorder = _recorder = Recorder()
+    rng = random.Random(seed + number)
+    adresse = f"Teststraße {rng.randrange(distinct_addresses) + 1}, 12345 Teststadt"
+    error = None
+    try:
+        at = AppTest.from_file(APP, default_timeout=timeout)
+        recorder.timed("rerun.start", at.run)
+        recorder.timed("rerun.grundstuecks_groesse", at.number_input[0].set_value(rng.randrange(300, 1500)).run)
+        recorder.timed("rerun.adresse", at.text_input[0].input(adresse).run)
+
+        # Warten, bis die Adresssuche im Hintergrund fertig ist und die Karte erscheint
+        started = time.perf_counter()
+        while any("Suche Adresse" in info.value for info in at.info):
+            if time.perf_counter() - started > timeout:
+                raise TimeoutError("Adresssuche nicht rechtzeitig beendet")
+            time.sleep(0.05)
+            at.run()
+        recorder.add("geocode.wait", time.perf_counter() - started)
+
+        for i in range(1, 11):
+            recorder.timed("rerun.frage", at.radio(key=f"frage_{i}").set_value(rng.randint(1, 5)).run)
+
+        recorder.timed("rerun.zusammenfassung", at.button[0].click().run)
+        recorder.timed("rerun.bestaetigung", at.button(key="bestaetigung").click().run)
+        if at.exception:
+            error = at.exception[0].message
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+
+    if error:
+        error = f"Sitzung {number}: {error}"
+    for cache in _geocode_caches:
+        cache.flush_stats()
+    memory["rss_after_kib"] = current_rss_kib()
+    memory["peak_kib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return recorder.samples, error, memory
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline):
+    """Print the relative change of every percentile against `baseline`."""
+    for name, stats in report["timings"].items():
+        before = baseline.get("timings", {}).get(name)
+        if not before:
+            continue
+        changes = []
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if before[key]:
+                changes.append(f"{key} {stats[key] / before[key] - 1:+.0%}")
+        print(f"{name:30s} {'  '.join(changes)}")
+
+
+def memory_report(sessions):
+    """
+    Summarize the per-session memory records of `run_session` in MB.
+
+    The first session of each worker also pays for imports and cold
+    caches, so its RSS growth is reported separately.
+    """
+    def mb(values):
+        values = np.array(values, dtype=float) / 1024
+        if not len(values):
+            return None
+        return {"p50": float(np.median(values)), "mean": float(values.mean()), "max": float(values.max())}
+
+    delta = [m["rss_after_kib"] - m["rss_before_kib"] for m in sessions]
+    peaks = {}
+    counts = {}
+    for m in sessions:
+        peaks[m["pid"]] = max(peaks.get(m["pid"], 0), m["peak_kib"])
+        counts[m["pid"]] = counts.get(m["pid"], 0) + 1
+    return {
+        "rss_growth_per_session_mb": mb([d for d, m in zip(delta, sessions) if m["index"] > 0]),
+        "rss_growth_first_session_mb": mb([d for d, m in zip(delta, sessions) if m["index"] == 0]),
+        "peak_rss_per_worker_mb": mb(list(peaks.values())),
+        "peak_rss_per_worker_divided_by_sessions_mb": mb([peaks[pid] / counts[pid] for pid in peaks]),
+        "sessions_per_worker": {str(pid): count for pid, count in counts.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lasttest mit parallelen Planungssitzungen")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=5,
+                        help="Anzahl paralleler Worker-Prozesse")
+    parser.add_argument("--geocode-latency", type=float, default=0.3,
+                        help="Antwortzeit des Stub-Geocoders in Sekunden")
+    parser.add_argument("--distinct-addresses", type=int, default=10,
+                        help="Anzahl verschiedener Adressen (bestimmt die Cache-Trefferquote)")
+    parser.add_argument("--rate", type=float, default=1000.0,
+                        help="Rate-Limit gegenüber dem Stub (Anfragen pro Sekunde)")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--compare", help="Früherer Bericht zum Vergleich")
+    args = parser.parse_args(argv)
+
+    # Konfiguration muss vor dem Import der App-Module gesetzt sein
+    server = start_stub_nominatim(args.geocode_latency)
+    data_dir = tempfile.mkdtemp(prefix="house_planner_bench_")
+    os.environ["HOUSE_PLANNER_DATA_DIR"] = data_dir
+    os.environ["HOUSE_PLANNER_GEOCODE_CACHE"] = os.path.join(data_dir, "geocode_cache.sqlite3")
+    os.environ["HOUSE_PLANNER_SUBMISSION_DB"] = os.path.join(data_dir, "submissions.sqlite3")
+    os.environ["HOUSE_PLANNER_NOMINATIM_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ["HOUSE_PLANNER_NOMINATIM_RATE"] = str(args.rate)
+    os.environ["HOUSE_PLANNER_NOMINATIM_MAX_PENDING"] = str(max(20, args.concurrency * 2))
+    sys.path.insert(0, ROOT)
+
+    recorder = Recorder()
+    errors = []
+    memory = []
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.concurrency, initializer=_init_worker) as executor:
+        futures = [
+            executor.submit(run_session, n, args.seed, args.distinct_addresses, args.timeout)
+            for n in range(args.sessions)
+        ]
+        for future in futures:
+            samples, error, session_memory = future.result()
+            recorder.merge(samples)
+            memory.append(session_memory)
+            if error:
+                errors.append(error)
+    duration = time.perf_counter() - started
+
+    from geocode_cache import GeocodeCache
+
+    cache_stats = GeocodeCache.from_settings().stats()
+    lookups = cache_stats["shared_hits"] + cache_stats["shared_misses"]
+    report = {
+        "commit": git_commit(),
+        "created_at": time.time(),
+        "config": vars(args),
+        "duration_s": duration,
+        "sessions_per_s": args.sessions / duration,
+        "errors": errors,
+        "timings": recorder.summary(),
+        "geocode_cache": {
+            **cache_stats,
+            "hit_rate": cache_stats["shared_hits"] / lookups if lookups else None,
+        },
+        # ru_maxrss ist unter Linux in KiB angegeben
+        "memory": memory_report(memory),
+    }
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for name, stats in report["timings"].items():
+        print(f"{name:30s} n={stats['count']:4d}  p50={stats['p50_ms']:8.1f} ms  "
+              f"p95={stats['p95_ms']:8.1f} ms  p99={stats['p99_ms']:8.1f} ms")
+    print(f"Cache-Trefferquote: {report['geocode_cache']['hit_rate']}")
+    speicher = report["memory"]
+    if speicher["rss_growth_per_session_mb"]:
+        print(f"RSS-Zuwachs je Sitzung (warm): p50 {speicher['rss_growth_per_session_mb']['p50']:.1f} MB, "
+              f"max {speicher['rss_growth_per_session_mb']['max']:.1f} MB")
+    if speicher["rss_growth_first_session_mb"]:
+        print(f"RSS-Zuwachs erste Sitzung je Worker: Ø {speicher['rss_growth_first_session_mb']['mean']:.1f} MB")
+    if speicher["peak_rss_per_worker_mb"]:
+        print(f"Spitzen-RSS je Worker: max {speicher['peak_rss_per_worker_mb']['max']:.0f} MB")
+    print(f"Fehler: {len(errors)}")
+    for error in errors:
+        print(error)
+    print(f"Bericht: {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+    server.shutdown()
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    # AppTest ersetzt in den Workern __main__ durch die App; Aufgaben müssen
+    # daher über den Modulnamen statt über __main__ referenziert werden
+    import load_test
+
+    sys.exit(load_test.main())
@@ -0,0 +1,123 @@
+"""
+Size-bounded LRU cache of binary blobs on disk.
+
+Each entry is a data file plus a small JSON metadata sidecar, both named
+after the SHA-256 of the key. Reads refresh the file's mtime, and when
+the cache grows beyond `max_bytes` the least recently used entries are
+deleted. Writes are atomic, so several processes may share a directory.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+
+class DiskLRUCache:
+    """
+    Blob cache in `directory` holding at most about `max_bytes` of data.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(size for _, size, _ in self._entries())
+
+    def _paths(self, key):
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        subdir = os.path.join(self.directory, digest[:2])
+        return os.path.join(subdir, digest), os.path.join(subdir, digest + ".json")
+
+    def _entries(self):
+        """Yield (data path, size, mtime) for every entry in the cache."""
+        for subdir in os.scandir(self.directory):
+            if not subdir.is_dir():
+                continue
+            for entry in os.scandir(subdir.path):
+                if entry.name.endswith((".json", ".tmp")):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield entry.path, stat.st_size, stat.st_mtime
+
+    def get(self, key):
+        """
+        Return (data, metadata) for `key` or None, and mark it as recently used.
+        """
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(data_path, "rb") as f:
+                data = f.read()
+            with open(meta_path, encoding="utf-8") as f:
+                metadata = json.load(f)
+            os.utime(data_path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return data, metadata
+
+    def put(self, key, data, metadata=None):
+        """Store `data` with optional `metadata` under `key`."""
+        data_path, meta_path = self._paths(key)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        try:
+            previous = os.path.getsize(data_path)
+        except FileNotFoundError:
+            previous = 0
+        # Metadaten zuerst schreiben: eine Datendatei ohne Sidecar gilt als fehlend
+        self._write_atomic(meta_path, json.dumps(metadata or {}).encode("utf-8"))
+        self._write_atomic(data_path, data)
+
+        with self._lock:
+            self._size += len(data) - previous
+            over_budget = self._size > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def update_metadata(self, key, metadata):
+        """Replace the metadata of an existing entry and mark it as recently used."""
+        data_path, meta_path = self._paths(key)
+        self._write_atomic(meta_path, json.dumps(metadata).encode("utf-8"))
+        try:
+            os.utime(data_path)
+        except FileNotFoundError:
+            pass
+
+    def _write_atomic(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def evict(self):
+        """
+        Delete least recently used entries until the cache uses at most 90 %
+        of `max_bytes`. The directory is rescanned, so entries written by
+        other processes are accounted for.
+        """
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda e: e[2])
+            total = sum(size for _, size, _ in entries)
+            target = self.max_bytes * 0.9
+            for path, size, _ in entries:
+                if total <= target:
+                    break
+                for stale in (path, path + ".json"):
+                    try:
+                        os.unlink(stale)
+                    except FileNotFoundError:
+                        pass
+                total -= size
+            self._size = total
+
+    @property
+    def size(self):
+        return self._size
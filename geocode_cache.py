@@ -0,0 +1,220 @@
+"""
+Disk-backed geocoding cache shared by all app processes.
+
+Results are stored in a SQLite database in WAL mode so that several
+Streamlit replicas on the same host can read and write concurrently.
+Keys are normalized addresses, entries expire after a TTL that depends
+on the kind of result, and the table is trimmed to a maximum number of
+entries by evicting the least recently used rows.
+
+Reads stay off SQLite's writer lock where possible: hit/miss counters
+are kept in memory and added to the shared counters every few seconds,
+and an entry's last access time is only refreshed once it is older than
+`access_resolution`. Expired and surplus entries are evicted every
+`evict_every` inserts or when the approximate entry count exceeds the
+limit, not on every insert.
+"""
+
+import atexit
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import settings
+
+_UMLAUTS = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+_STREET_ABBREVIATION = re.compile(r"str\.(?=\s|,|$)")
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize_address(address):
+    """
+    Normalize an address so that spelling variants map to the same key.
+
+    "Musterstraße 1, 12345 Musterstadt" and "musterstrasse 1 12345 musterstadt"
+    both become "musterstrasse 1 12345 musterstadt".
+    """
+    text = address.strip().lower().translate(_UMLAUTS)
+    text = _STREET_ABBREVIATION.sub("strasse", text)
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _NON_WORD.sub(" ", text)
+    return " ".join(text.split())
+
+
+class GeocodeCache:
+    """
+    SQLite cache for geocoding results.
+
+    Found addresses are kept for `ttl` seconds, "not found" results for
+    `not_found_ttl` and failed lookups for `error_ttl`, so transient errors
+    are retried soon while valid results survive restarts and redeploys.
+    """
+
+    def __init__(self, path, ttl, not_found_ttl, error_ttl, max_entries,
+                 access_resolution=3600, stats_interval=10.0, evict_every=100):
+        self.path = path
+        self.ttl = ttl
+        self.not_found_ttl = not_found_ttl
+        self.error_ttl = error_ttl
+        self.max_entries = max_entries
+        self.access_resolution = access_resolution
+        self.stats_interval = stats_interval
+        self.evict_every = evict_every
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # Noch nicht in die gemeinsame stats-Tabelle übertragene Zähler
+        self._pending = {"hits": 0, "misses": 0}
+        self._stats_flushed = time.monotonic()
+        self._inserts = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS geocode (
+                    key TEXT PRIMARY KEY,
+                    result TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS geocode_last_access ON geocode (last_access);
+                CREATE INDEX IF NOT EXISTS geocode_expires_at ON geocode (expires_at);
+                CREATE TABLE IF NOT EXISTS stats (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                );
+                INSERT OR IGNORE INTO stats (name, value) VALUES ('hits', 0), ('misses', 0);
+                """
+            )
+            (self._entries,) = conn.execute("SELECT COUNT(*) FROM geocode").fetchone()
+        atexit.register(self.flush_stats)
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            path=settings.GEOCODE_CACHE_PATH,
+            ttl=settings.GEOCODE_CACHE_TTL,
+            not_found_ttl=settings.GEOCODE_CACHE_NOT_FOUND_TTL,
+            error_ttl=settings.GEOCODE_CACHE_ERROR_TTL,
+            max_entries=settings.GEOCODE_CACHE_MAX_ENTRIES,
+        )
+
+    def _connection(self):
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+            self._pending[name] += 1
+            due = time.monotonic() - self._stats_flushed >= self.stats_interval
+        if due:
+            self.flush_stats()
+
+    def flush_stats(self):
+        """Add the counters collected since the last flush to the shared counters."""
+        with self._lock:
+            pending = [(value, name) for name, value in self._pending.items() if value]
+            self._pending = {"hits": 0, "misses": 0}
+            self._stats_flushed = time.monotonic()
+        if pending:
+            with self._connection() as conn:
+                conn.executemany("UPDATE stats SET value = value + ? WHERE name = ?", pending)
+
+    def get(self, address, record_stats=True):
+        """
+        Return the cached result for `address` or None on a miss.
+
+        With `record_stats=False` the lookup does not touch the hit/miss
+        counters, e.g. for re-checks of a lookup that was already counted.
+        """
+        key = normalize_address(address)
+        now = time.time()
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT result, last_access FROM geocode WHERE key = ? AND expires_at > ?",
+            (key, now),
+        ).fetchone()
+        if row is not None and now - row[1] >= self.access_resolution:
+            # Für die LRU-Verdrängung genügt eine grobe Zugriffszeit; spart Schreibsperren
+            with conn:
+                conn.execute("UPDATE geocode SET last_access = ? WHERE key = ?", (now, key))
+
+        if record_stats:
+            self._count("misses" if row is None else "hits")
+        return None if row is None else json.loads(row[0])
+
+    def set(self, address, result):
+        """Store `result` for `address` and evict old entries if the cache is full."""
+        if result.get("found"):
+            ttl = self.ttl
+        elif "error" in result:
+            ttl = self.error_ttl
+        else:
+            ttl = self.not_found_ttl
+
+        key = normalize_address(address)
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO geocode (key, result, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(result), now + ttl, now),
+            )
+            with self._lock:
+                self._inserts += 1
+                self._entries += 1
+                evict = self._inserts % self.evict_every == 0 or self._entries > self.max_entries
+            if evict:
+                self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        # Andere Prozesse fügen ebenfalls ein, daher hier die tatsächliche Anzahl zählen
+        conn.execute("DELETE FROM geocode WHERE expires_at <= ?", (now,))
+        (count,) = conn.execute("SELECT COUNT(*) FROM geocode").fetchone()
+        if count > self.max_entries:
+            # Etwas unter das Limit kürzen, damit ein voller Cache nicht bei jedem Einfügen verdrängt
+            target = self.max_entries - min(self.evict_every, self.max_entries // 10)
+            conn.execute(
+                "DELETE FROM geocode WHERE key IN "
+                "(SELECT key FROM geocode ORDER BY last_access ASC LIMIT ?)",
+                (count - target,),
+            )
+            count = target
+        with self._lock:
+            self._entries = count
+
+    def stats(self):
+        """
+        Return hit/miss counters.
+
+        `hits`/`misses` count lookups of this process, `shared_hits` and
+        `shared_misses` are accumulated over all processes using the file
+        (other processes add theirs every `stats_interval` seconds).
+        """
+        self.flush_stats()
+        with self._connection() as conn:
+            shared = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+            (entries,) = conn.execute("SELECT COUNT(*) FROM geocode").fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared_hits": shared.get("hits", 0),
+            "shared_misses": shared.get("misses", 0),
+            "entries": entries,
+        }
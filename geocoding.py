@@ -0,0 +1,296 @@
+"""
+Shared geocoding service layer.
+
+One `GeocodingService` per process wraps the disk cache, a pooled HTTP
+client for Nominatim, a token bucket enforcing Nominatim's usage policy
+(max. 1 request per second) and single-flight deduplication, so concurrent
+callers asking for the same address wait on one upstream request.
+
+All backends implement the `Geocoder` interface; `build_geocoder` puts
+the offline address index in front of Nominatim when one is configured.
+"""
+
+import abc
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import settings
+from address_index import AddressIndex
+from instrumentation import external_call
+from geocode_cache import GeocodeCache, normalize_address
+
+
+class Geocoder(abc.ABC):
+    """
+    Interface of all geocoding backends.
+
+    `geocode` returns a dict with "found" and, for found addresses,
+    "latitude", "longitude" and "address"; failures carry an "error".
+    """
+
+    @abc.abstractmethod
+    def geocode(self, address):
+        """Look up `address` and return a result dict."""
+
+
+class GeocodingBusy(Exception):
+    """Raised when too many lookups are already waiting for the rate limiter."""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    `rate` tokens are added per second up to `capacity`; `acquire` blocks
+    until a token is available.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one execution.
+
+    The first caller for a key runs the function, every caller arriving
+    while it is in flight waits for and receives the same result.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"done": threading.Event(), "result": None, "error": None}
+                self._calls[key] = call
+
+        if not leader:
+            call["done"].wait()
+        else:
+            try:
+                call["result"] = fn()
+            except BaseException as e:
+                call["error"] = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call["done"].set()
+
+        if call["error"] is not None:
+            raise call["error"]
+        return call["result"]
+
+
+class NominatimClient:
+    """
+    Rate-limited Nominatim search client with a pooled HTTP session.
+
+    At most `max_pending` lookups may wait for the rate limiter at the same
+    time; further callers fail fast with `GeocodingBusy` instead of piling
+    up. Responses with status 429 or 5xx are retried with exponential
+    backoff, honouring a `Retry-After` header when present. No retry waits
+    longer than `max_retry_delay`; if the server asks for a longer wait,
+    the lookup fails instead of blocking a worker.
+    """
+
+    def __init__(self, base_url, user_agent, timeout=10, rate=1.0,
+                 max_pending=20, max_retries=3, backoff=1.0, max_retry_delay=5.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_retry_delay = max_retry_delay
+        self.bucket = TokenBucket(rate)
+        self._pending = threading.BoundedSemaphore(max_pending)
+
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = user_agent
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(4, max_pending))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            base_url=settings.NOMINATIM_URL,
+            user_agent=settings.NOMINATIM_USER_AGENT,
+            timeout=settings.NOMINATIM_TIMEOUT,
+            rate=settings.NOMINATIM_RATE,
+            max_pending=settings.NOMINATIM_MAX_PENDING,
+            max_retries=settings.NOMINATIM_MAX_RETRIES,
+            max_retry_delay=settings.NOMINATIM_MAX_RETRY_DELAY,
+        )
+
+    def _retry_delay(self, response, attempt):
+        """
+        Seconds to wait before the next attempt, or None if the server asks
+        for a longer wait than `max_retry_delay`.
+        """
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = float(retry_after)
+            return delay if delay <= self.max_retry_delay else None
+        return min(self.backoff * (2 ** attempt) * (1 + random.random() / 2), self.max_retry_delay)
+
+    def search(self, address):
+        """Look up `address` and return a result dict as used by the app."""
+        if not self._pending.acquire(blocking=False):
+            raise GeocodingBusy("Zu viele gleichzeitige Adressanfragen")
+        try:
+            for attempt in range(self.max_retries + 1):
+                self.bucket.acquire()
+                response = None
+                try:
+                    with external_call("nominatim"):
+                        response = self.session.get(
+                            f"{self.base_url}/search",
+                            params={"q": address, "format": "jsonv2", "limit": 1},
+                            timeout=self.timeout,
+                        )
+                except (requests.ConnectionError, requests.Timeout):
+                    if attempt == self.max_retries:
+                        raise
+                else:
+                    if response.status_code != 429 and response.status_code < 500:
+                        break
+                    if attempt == self.max_retries:
+                        break
+                delay = self._retry_delay(response, attempt)
+                if delay is None:
+                    # Retry-After zu lang: Anfrage mit dem Statusfehler abbrechen
+                    break
+                time.sleep(delay)
+
+            response.raise_for_status()
+            places = response.json()
+        finally:
+            self._pending.release()
+
+        if not places:
+            return {"found": False}
+        place = places[0]
+        return {
+            "latitude": float(place["lat"]),
+            "longitude": float(place["lon"]),
+            "address": place["display_name"],
+            "found": True
+        }
+
+
+class GeocodingService(Geocoder):
+    """
+    Cache-first Nominatim geocoding with single-flight coalescing of
+    upstream requests.
+    """
+
+    def __init__(self, cache, client):
+        self.cache = cache
+        self.client = client
+        self._flights = SingleFlight()
+
+    @classmethod
+    def from_settings(cls):
+        return cls(GeocodeCache.from_settings(), NominatimClient.from_settings())
+
+    def geocode(self, address):
+        cached = self.cache.get(address)
+        if cached is not None:
+            return cached
+        return self._flights.do(normalize_address(address), lambda: self._lookup(address))
+
+    def _lookup(self, address):
+        # Another caller may have filled the cache while we were queued
+        cached = self.cache.get(address, record_stats=False)
+        if cached is not None:
+            return cached
+
+        try:
+            result = self.client.search(address)
+        except GeocodingBusy as e:
+            # Local overload is not a property of the address, don't cache it
+            return {"found": False, "error": str(e)}
+        except Exception as e:
+            result = {"found": False, "error": str(e)}
+
+        self.cache.set(address, result)
+        return result
+
+
+class OfflineGeocoder(Geocoder):
+    """
+    Geocoder backed by a memory-mapped `AddressIndex` file.
+
+    Only exact, unambiguous matches count as found; other index matches
+    are returned as a "suggestion" of a not-found result.
+    """
+
+    def __init__(self, index):
+        self.index = index
+
+    def geocode(self, address):
+        match = self.index.lookup(address)
+        if match is None:
+            return {"found": False}
+        result = {
+            "latitude": match["latitude"],
+            "longitude": match["longitude"],
+            "address": match["address"],
+            "match": match["match"],
+        }
+        if match["match"] != "exact":
+            # Nur ein Vorschlag (andere Hausnummer, Straße oder mehrdeutiger Ort)
+            return {"found": False, "suggestion": result}
+        result["found"] = True
+        return result
+
+
+class FallbackGeocoder(Geocoder):
+    """
+    Ask `primary` first and only fall back to `fallback` if it finds nothing.
+    """
+
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+
+    def geocode(self, address):
+        result = self.primary.geocode(address)
+        if result["found"]:
+            return result
+        return self.fallback.geocode(address)
+
+
+def build_geocoder():
+    """
+    Create the configured geocoder: the offline index (if configured) with
+    Nominatim as fallback, otherwise Nominatim only.
+    """
+    service = GeocodingService.from_settings()
+    if not settings.ADDRESS_INDEX_PATH:
+        return service
+    return FallbackGeocoder(OfflineGeocoder(AddressIndex(settings.ADDRESS_INDEX_PATH)), service)
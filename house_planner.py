@@ -1,36 +1,259 @@
+import logging
 import streamlit as st
-import folium
-from streamlit_folium import st_folium
-import requests
-from geopy.geocoders import Nominatim
-import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
-@st.cache_data(ttl=3600)  # Cache for 1 hour
-def geocode_address(address):
+import instrumentation
+import settings
+from geocoding import build_geocoder
+from instrumentation import span
+from map_rendering import render_map_html, render_static_map
+from massing_model import MassingModelCache, floor_areas, layout, model_parameters
+from massing_viewer import viewer_html
+from matching import DesignCatalog
+from planner_core import BEWERTUNG_OPTIONEN, FRAGEN, build_answers, build_result, rank_answers
+from plot_index import PlotIndex, keep_snapshot
+from solar import solar_analysis
+from submission_store import SubmissionStore
+from tile_proxy import TileCache, start_tile_proxy
+
+logger = logging.getLogger("house_planner")
+
+@st.cache_resource
+def get_geocoder():
+    """
+    Process-wide geocoder: offline address index (if configured) with the
+    cached, rate-limited Nominatim service as fallback.
+    """
+    return build_geocoder()
+
+def geocode_address(address, geocoder=None):
     """
     Geocode an address and return location data.
-    Cached to avoid repeated API calls for the same address.
+    Addresses found in the offline index never reach Nominatim; Nominatim
+    results are cached on disk and shared between all app processes.
+    Errors (e.g. a locked cache database) are returned as {"found": False,
+    "error": ...} instead of being raised.
     """
     try:
-        geolocator = Nominatim(
-            user_agent="house_planner_v1.0",
-            timeout=10
-        )
-        location = geolocator.geocode(address)
-        
-        if location:
-            return {
-                "latitude": location.latitude,
-                "longitude": location.longitude,
-                "address": location.address,
-                "found": True
-            }
-        else:
-            return {"found": False}
-            
+        return (geocoder or get_geocoder()).geocode(address)
     except Exception as e:
         return {"found": False, "error": str(e)}
 
+@st.cache_resource
+def get_geocode_executor():
+    """
+    Worker threads that run geocoding outside of the script thread.
+    """
+    return ThreadPoolExecutor(
+        max_workers=settings.GEOCODE_WORKERS,
+        thread_name_prefix="geocode"
+    )
+
+@st.cache_resource
+def get_prefetch_executor():
+    """
+    Single worker thread for tile prefetching, separate from geocoding so
+    address lookups never wait behind tile downloads.
+    """
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="kacheln")
+
+@st.cache_resource
+def get_design_catalog():
+    """
+    Catalog of house designs for recommendations, or None if not configured.
+    """
+    if not settings.DESIGN_CATALOG_PATH:
+        return None
+    return DesignCatalog.load(settings.DESIGN_CATALOG_PATH)
+
+@st.cache_resource
+def get_tile_cache():
+    """
+    Tile cache of the embedded tile proxy, or None if the proxy is disabled.
+    """
+    if not settings.TILE_PROXY_PORT:
+        return None
+    tiles = TileCache.from_settings()
+    try:
+        start_tile_proxy(tiles, settings.TILE_PROXY_HOST, settings.TILE_PROXY_PORT)
+    except OSError:
+        # Port belegt: der Proxy läuft bereits in einem anderen Prozess
+        pass
+    return tiles
+
+@st.cache_resource
+def get_session_tracker():
+    """
+    Enable timing instrumentation if the metrics endpoint or the debug
+    panel is configured, and return the tracker of active sessions (None
+    while disabled). The endpoint exposes section timings, geocode cache
+    counters, external request latency and active sessions.
+    """
+    if not settings.METRICS_PORT and not settings.DEBUG_PANEL:
+        return None
+    instrumentation.enable()
+    tracker = instrumentation.SessionTracker(settings.METRICS_SESSION_TIMEOUT)
+    instrumentation.REGISTRY.add_collector(tracker.collect)
+    # Mit Offline-Index liegt der Nominatim-Dienst (und damit der Cache) im Fallback
+    service = getattr(get_geocoder(), "fallback", get_geocoder())
+    instrumentation.REGISTRY.add_collector(instrumentation.geocode_cache_collector(service.cache))
+    if settings.METRICS_PORT:
+        try:
+            instrumentation.start_metrics_server(host=settings.METRICS_HOST, port=settings.METRICS_PORT)
+        except OSError as e:
+            # Jede Replik braucht einen eigenen Port, sonst sind ihre Metriken nicht abrufbar
+            logger.warning(
+                "Metrik-Endpunkt auf %s:%d nicht gestartet (%s); die Metriken dieses Prozesses "
+                "sind nicht abrufbar. Jede Replik braucht einen eigenen HOUSE_PLANNER_METRICS_PORT.",
+                settings.METRICS_HOST, settings.METRICS_PORT, e
+            )
+    return tracker
+
+def geocode_im_hintergrund(adresse):
+    """
+    Start geocoding `adresse` in the background and return its future.
+    The future is kept in the session so reruns don't resubmit the lookup;
+    the map's retry button discards it after a failed lookup.
+    With the tile proxy enabled, tiles around the plot are prefetched on
+    their own worker as soon as the coordinates are known.
+    """
+    laufend = st.session_state.get("geocoding")
+    if laufend is None or laufend["adresse"] != adresse:
+        executor = get_geocode_executor()
+        geocoder = get_geocoder()
+
+        def suchen():
+            with span("geocoding"):
+                return geocode_address(adresse, geocoder)
+
+        future = executor.submit(suchen)
+        tiles = get_tile_cache()
+        if tiles is not None:
+            vorladen = get_prefetch_executor()
+
+            def kacheln_vorladen(f):
+                result = f.result()
+                if result["found"]:
+                    vorladen.submit(tiles.prefetch, result["latitude"], result["longitude"])
+            future.add_done_callback(kacheln_vorladen)
+        laufend = {"adresse": adresse, "future": future}
+        st.session_state.geocoding = laufend
+    return laufend["future"]
+
+def aktueller_standort(adresse):
+    """
+    Geocoding result for `adresse` if the background lookup has finished,
+    otherwise None.
+    """
+    geocoding = st.session_state.get("geocoding")
+    if adresse and geocoding and geocoding["adresse"] == adresse and geocoding["future"].done():
+        return geocoding["future"].result()
+    return None
+
+@st.cache_resource
+def get_submission_store():
+    """
+    Process-wide write-behind store for confirmed submissions.
+    """
+    return SubmissionStore.from_settings()
+
+@st.cache_resource
+def get_model_cache():
+    """
+    Disk cache of generated 3D massing models.
+    """
+    return MassingModelCache.from_settings()
+
+@st.cache_data(max_entries=128)
+def modell_als_html(parameter):
+    """
+    Viewer page for the massing model, cached by the model parameters.
+    """
+    return viewer_html(get_model_cache().get_model(parameter), height=600)
+
+@st.cache_resource
+def get_plot_index():
+    """
+    Spatial index of confirmed plots: the snapshot (if any) plus all
+    submissions stored since it was written. The snapshot is rewritten
+    right away and then regularly, so the next start replays little.
+    """
+    index = PlotIndex.from_settings()
+    keep_snapshot(index, get_submission_store(), settings.PLOT_INDEX_PATH, settings.PLOT_INDEX_SAVE_INTERVAL)
+    return index
+
+@st.fragment(run_every=0.5)
+def geocoding_status(future):
+    """
+    Poll a pending lookup; once coordinates arrive, rerun the page once so
+    the map fragment replaces this placeholder.
+    """
+    if future.done():
+        st.rerun()
+    st.info("🔍 Suche Adresse...")
+
+@st.cache_data(max_entries=256)
+def karte_als_html(latitude, longitude, zoom, popup):
+    """
+    Interactive map HTML, cached by its parameters so reruns only resend it.
+    """
+    return render_map_html(latitude, longitude, zoom, popup)
+
+@st.cache_data(max_entries=256)
+def karte_als_bild(latitude, longitude, zoom):
+    """
+    Static PNG map, cached by its parameters. Tiles come from the embedded
+    proxy's cache when it is enabled (the server can always reach it).
+    """
+    return render_static_map(latitude, longitude, zoom, tiles=get_tile_cache())
+
+@st.fragment
+def karte_anzeigen(adresse, location_data):
+    """
+    Map of the plot. Runs as its own fragment, so questionnaire clicks never
+    rebuild it, and map interactions don't rerun the rest of the page.
+    """
+    with span("karte"):
+        if location_data["found"]:
+            # Koordinaten runden, damit der Cache-Schlüssel stabil ist
+            latitude = round(location_data["latitude"], 6)
+            longitude = round(location_data["longitude"], 6)
+
+            interaktiv = st.toggle(
+                "Interaktive Karte",
+                value=settings.MAP_INTERACTIVE,
+                help="Statische Karte lädt schneller, kann aber nicht verschoben werden"
+            )
+
+            bild = None
+            if not interaktiv:
+                try:
+                    with span("karte.bild"):
+                        bild = karte_als_bild(latitude, longitude, 15)
+                except Exception as e:
+                    st.warning(f"⚠️ Statische Karte nicht verfügbar, zeige interaktive Karte: {e}")
+
+            # Karte anzeigen
+            if bild is not None:
+                st.image(bild, width=700)
+            else:
+                with span("karte.html"):
+                    karte_html = karte_als_html(latitude, longitude, 15, f"Grundstück: {adresse}")
+                st.components.v1.html(karte_html, width=700, height=400)
+        
+            # Zusätzliche Informationen
+            st.info(f"📍 Koordinaten: {location_data['latitude']:.6f}, {location_data['longitude']:.6f}")
+        
+        elif "error" in location_data:
+            st.error(f"❌ Fehler beim Laden der Karte: {location_data['error']}")
+            # Vorübergehende Fehler (Rate-Limit, Timeout) nicht bis zum Sitzungsende stehen lassen
+            if st.button("🔁 Erneut versuchen", key="geocoding_wiederholen"):
+                del st.session_state["geocoding"]
+                st.rerun()
+        else:
+            st.warning("⚠️ Adresse konnte nicht gefunden werden. Bitte überprüfen Sie die Eingabe.")
+
 # Seitenkonfiguration
 st.set_page_config(
     page_title="Hausplaner - Grundstück & Präferenzen",
@@ -43,6 +266,14 @@ if 'eingaben_bestaetigt' not in st.session_state:
     st.session_state.eingaben_bestaetigt = False
 if 'zusammenfassung_angezeigt' not in st.session_state:
     st.session_state.zusammenfassung_angezeigt = False
+if 'sitzungs_id' not in st.session_state:
+    st.session_state.sitzungs_id = uuid.uuid4().hex
+
+# Laufzeitmessung dieses Durchlaufs starten (ohne Konfiguration wirkungslos)
+sitzungen = get_session_tracker()
+if sitzungen is not None:
+    sitzungen.touch(st.session_state.sitzungs_id)
+instrumentation.begin_rerun()
 
 # Logo anzeigen (zentriert)
 col1, col2, col3 = st.columns([1, 2, 1])
@@ -96,37 +327,13 @@ if adresse:
     
     col1, col2, col3 = st.columns([1, 1, 2])
     with col2:
-        # Use cached geocoding function
-        with st.spinner("🔍 Suche Adresse..."):
-            location_data = geocode_address(adresse)
-        
-        if location_data["found"]:
-            # Karte erstellen
-            m = folium.Map(
-                location=[location_data["latitude"], location_data["longitude"]],
-                zoom_start=15,
-                width=700,
-                height=400
-            )
-            
-            # Marker für das Grundstück hinzufügen
-            folium.Marker(
-                [location_data["latitude"], location_data["longitude"]],
-                popup=f"Grundstück: {adresse}",
-                tooltip="Ihr Grundstück",
-                icon=folium.Icon(color='red', icon='home')
-            ).add_to(m)
-            
-            # Karte anzeigen
-            st_folium(m, width=700, height=400)
-            
-            # Zusätzliche Informationen
-            st.info(f"📍 Koordinaten: {location_data['latitude']:.6f}, {location_data['longitude']:.6f}")
-            
-        elif "error" in location_data:
-            st.error(f"❌ Fehler beim Laden der Karte: {location_data['error']}")
+        # Geocoding läuft im Hintergrund, der Fragebogen wird sofort angezeigt
+        with span("geocoding.start"):
+            future = geocode_im_hintergrund(adresse)
+        if future.done():
+            karte_anzeigen(adresse, future.result())
         else:
-            st.warning("⚠️ Adresse konnte nicht gefunden werden. Bitte überprüfen Sie die Eingabe.")
+            geocoding_status(future)
 
 st.markdown("---")
 
@@ -136,170 +343,243 @@ with col2:
     st.header("🏡 Präferenzen für Ihr Traumhaus")
     st.markdown("Bewerten Sie bitte die folgenden Aspekte nach ihrer Wichtigkeit für Sie (1 = unwichtig, 5 = sehr wichtig)")
 
-# Liste der Fragen
-fragen = [
-    "Wie wichtig ist es Ihnen, mit Sonnenschein im Fenster frühstücken zu können?",
-    "Wie wichtig ist Ihnen ein großer, offener Wohnbereich?",
-    "Wie wichtig ist Ihnen ein separates Arbeitszimmer/Home Office?",
-    "Wie wichtig ist Ihnen ein direkter Zugang zur Terrasse/Garten vom Wohnbereich?",
-    "Wie wichtig ist Ihnen eine moderne, offene Küche?",
-    "Wie wichtig ist Ihnen viel natürliches Licht in den Räumen?",
-    "Wie wichtig ist Ihnen die Privatsphäre gegenüber Nachbarn?",
-    "Wie wichtig ist Ihnen ein Gästezimmer?",
-    "Wie wichtig ist Ihnen eine energieeffiziente Bauweise?",
-    "Wie wichtig ist Ihnen ausreichend Stauraum/Abstellmöglichkeiten?"
-]
-
-# Dictionary zur Speicherung der Antworten
-antworten = {}
-
-# Bewertungsskala
-bewertung_optionen = {
-    1: "1 - Unwichtig",
-    2: "2 - Wenig wichtig", 
-    3: "3 - Neutral",
-    4: "4 - Wichtig",
-    5: "5 - Sehr wichtig"
-}
-
-# Fragen mit Bewertung anzeigen (zentriert)
-for i, frage in enumerate(fragen, 1):
-    # Zentrierte Spalten für Fragen
-    col1, col2, col3 = st.columns([1, 2, 1])
-    
-    with col2:
-        st.subheader(f"Frage {i}")
-        st.write(frage)
-        
-        # Radio buttons für die Bewertung
-        bewertung = st.radio(
-            "Bewertung:",
-            options=list(bewertung_optionen.keys()),
-            format_func=lambda x: bewertung_optionen[x],
-            key=f"frage_{i}",
-            horizontal=True
-        )
-        
-        antworten[f"frage_{i}"] = {
-            "frage": frage,
-            "bewertung": bewertung
-        }
+def aktuelle_antworten():
+    """
+    Answers built from the rating widgets' values in the session state.
+    """
+    return build_answers([st.session_state[f"frage_{i}"] for i in range(1, len(FRAGEN) + 1)])
+
+def bewertung_geaendert():
+    """
+    With the summary open, a rating change reruns the questionnaire and the
+    summary fragment together, so the summary never shows stale ratings.
+    """
+    if st.session_state.zusammenfassung_angezeigt:
+        st.rerun(["fragebogen", "zusammenfassung"])
+
+@st.fragment(key="fragebogen")
+def fragebogen():
+    """
+    Rating questions. Runs as its own fragment, so a click on a rating only
+    reruns this block (and the open summary) and never touches geocoding or
+    the map.
+    """
+    with span("fragebogen"):
+        # Fragen mit Bewertung anzeigen (zentriert)
+        for i, frage in enumerate(FRAGEN, 1):
+            # Zentrierte Spalten für Fragen
+            col1, col2, col3 = st.columns([1, 2, 1])
         
-        st.markdown("---")
+            with col2:
+                st.subheader(f"Frage {i}")
+                st.write(frage)
+            
+                # Radio buttons für die Bewertung
+                st.radio(
+                    "Bewertung:",
+                    options=list(BEWERTUNG_OPTIONEN.keys()),
+                    format_func=lambda x: BEWERTUNG_OPTIONEN[x],
+                    key=f"frage_{i}",
+                    horizontal=True,
+                    on_change=bewertung_geaendert
+                )
+            
+                st.markdown("---")
 
-# Zusammenfassung der Eingaben (zentriert)
-col1, col2, col3 = st.columns([1, 2, 1])
-with col2:
-    if st.button("📋 Zusammenfassung anzeigen", type="primary"):
-        st.session_state.zusammenfassung_angezeigt = True
+fragebogen()
 
-# Zusammenfassung anzeigen, wenn sie angefordert wurde
-if st.session_state.zusammenfassung_angezeigt:
-    # Zentrierte Spalten für die Zusammenfassung
+@st.fragment(key="zusammenfassung")
+def zusammenfassung(grundstuecks_groesse, adresse):
+    """
+    Summary, solar analysis, comparable plots and the confirmation button.
+    Runs as its own fragment driven by the session state, so opening it or
+    changing a rating never reruns geocoding or the map.
+    """
+    # Dictionary zur Speicherung der Antworten (Werte stehen über die Widget-Keys im Session State)
+    antworten = aktuelle_antworten()
+
+    # Zusammenfassung der Eingaben (zentriert)
     col1, col2, col3 = st.columns([1, 2, 1])
-    
     with col2:
-        st.header("📋 Zusammenfassung Ihrer Eingaben")
+        if st.button("📋 Zusammenfassung anzeigen", type="primary"):
+            st.session_state.zusammenfassung_angezeigt = True
+
+    # Zusammenfassung anzeigen, wenn sie angefordert wurde
+    if not st.session_state.zusammenfassung_angezeigt:
+        return
+    with span("zusammenfassung"):
+        # Zentrierte Spalten für die Zusammenfassung
+        col1, col2, col3 = st.columns([1, 2, 1])
+    
+        with col2:
+            st.header("📋 Zusammenfassung Ihrer Eingaben")
         
-        # Grundstücksinformationen
-        st.subheader("Grundstücksdaten")
-        st.write(f"**Größe:** {grundstuecks_groesse} m²")
-        st.write(f"**Adresse:** {adresse if adresse else 'Nicht angegeben'}")
+            # Grundstücksinformationen
+            st.subheader("Grundstücksdaten")
+            st.write(f"**Größe:** {grundstuecks_groesse} m²")
+            st.write(f"**Adresse:** {adresse if adresse else 'Nicht angegeben'}")
+
+            # Besonnung aus den Koordinaten (Fragen 1 und 6)
+            location_data = aktueller_standort(adresse)
+            if location_data and location_data["found"]:
+                with span("besonnung"):
+                    besonnung = solar_analysis(
+                        location_data["latitude"],
+                        location_data["longitude"],
+                        antworten["frage_1"]["bewertung"],
+                        antworten["frage_6"]["bewertung"]
+                    )
+                fassaden = besonnung["fassaden"]
+                empfohlen = besonnung["empfohlene_ausrichtung"]
+                fruehstueck = besonnung["fruehstueck_ausrichtung"]
+                st.subheader("☀️ Besonnung")
+                st.write(
+                    f"**Empfohlene Ausrichtung des Wohnbereichs:** {empfohlen} "
+                    f"(Ø {fassaden[empfohlen]['gesamt']:.1f} Sonnenstunden pro Tag)"
+                )
+                st.write(
+                    f"**Frühstückssonne:** {fruehstueck} "
+                    f"(Ø {fassaden[fruehstueck]['morgen']:.1f} Stunden zwischen 6 und 10 Uhr)"
+                )
+
+                # Frühere Grundstücke im Umkreis (ohne Adressen, nur Entfernung und Eckdaten)
+                with span("nachbarn"):
+                    nachbarn = [
+                        grundstueck for grundstueck in get_plot_index().nearest(
+                            location_data["latitude"],
+                            location_data["longitude"],
+                            k=6,
+                            max_radius_km=settings.COMPARABLE_PLOTS_RADIUS_KM
+                        )
+                        if grundstueck["adresse"] != adresse
+                    ][:5]
+                if nachbarn:
+                    st.subheader("👥 Vergleichbare Grundstücke in der Nähe")
+                    eigene = [data["bewertung"] for data in antworten.values()]
+                    for grundstueck in nachbarn:
+                        abweichung = sum(abs(a - b) for a, b in zip(eigene, grundstueck["bewertungen"])) / len(eigene)
+                        st.write(
+                            f"**{grundstueck['entfernung_km']:.1f} km entfernt:** "
+                            f"{grundstueck['grundstuecks_groesse']:.0f} m², "
+                            f"Präferenzen zu {1 - abweichung / 4:.0%} ähnlich"
+                        )
         
-        # Bewertungen
-        st.subheader("Ihre Präferenzen")
+            # Bewertungen
+            st.subheader("Ihre Präferenzen")
         
-        # Sortiere Antworten nach Bewertung (höchste zuerst)
-        sortierte_antworten = sorted(antworten.items(), 
-                                   key=lambda x: x[1]['bewertung'], 
-                                   reverse=True)
+            # Sortiere Antworten nach Bewertung (höchste zuerst)
+            sortierte_antworten = rank_answers(antworten)
         
-        for key, data in sortierte_antworten:
-            frage = data['frage']
-            bewertung = data['bewertung']
-            bewertung_text = bewertung_optionen[bewertung]
+            for key, data in sortierte_antworten:
+                frage = data['frage']
+                bewertung = data['bewertung']
+                bewertung_text = BEWERTUNG_OPTIONEN[bewertung]
             
-            # Farbe basierend auf Bewertung
-            if bewertung >= 4:
-                st.success(f"**{bewertung_text}:** {frage}")
-            elif bewertung == 3:
-                st.info(f"**{bewertung_text}:** {frage}")
-            else:
-                st.warning(f"**{bewertung_text}:** {frage}")
+                # Farbe basierend auf Bewertung
+                if bewertung >= 4:
+                    st.success(f"**{bewertung_text}:** {frage}")
+                elif bewertung == 3:
+                    st.info(f"**{bewertung_text}:** {frage}")
+                else:
+                    st.warning(f"**{bewertung_text}:** {frage}")
         
-        st.markdown("---")
+            st.markdown("---")
     
     # Bestätigungsbutton - jetzt außerhalb des ursprünglichen Button-Blocks
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
         if st.button("✅ Eingaben bestätigen und 3D-Modell anzeigen", type="primary", key="bestaetigung"):
+            # Nur einreihen, geschrieben wird im Hintergrund
+            with span("bestaetigung"):
+                location_data = aktueller_standort(adresse)
+                get_submission_store().submit(
+                    build_result(grundstuecks_groesse, adresse, location_data, antworten)
+                )
+                # Sofort im Umkreis-Index sichtbar, die ID vergibt erst der Speicher
+                if location_data and location_data["found"]:
+                    get_plot_index().insert(
+                        location_data["latitude"],
+                        location_data["longitude"],
+                        grundstuecks_groesse,
+                        [data["bewertung"] for data in antworten.values()],
+                        adresse
+                    )
             st.session_state.eingaben_bestaetigt = True
             st.success("🎉 Eingaben bestätigt! Das 3D-Modell wird geladen...")
             st.rerun()
 
+zusammenfassung(grundstuecks_groesse, adresse)
+
 # 3D-Modell anzeigen, wenn Eingaben bestätigt wurden
 if st.session_state.eingaben_bestaetigt:
+    antworten = aktuelle_antworten()
     st.markdown("---")
+
+    # Passende Hausentwürfe aus dem Katalog empfehlen
+    katalog = get_design_catalog()
+    if katalog is not None:
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col2:
+            st.header("🏘️ Empfohlene Hausentwürfe")
+            with span("empfehlungen"):
+                empfehlungen = katalog.top_k(
+                    [data["bewertung"] for data in antworten.values()],
+                    grundstuecks_groesse
+                )
+            if empfehlungen:
+                for platz, entwurf in enumerate(empfehlungen, 1):
+                    st.write(
+                        f"**{platz}. {entwurf['name']}** – Übereinstimmung {entwurf['score']:.0%}, "
+                        f"Grundfläche {entwurf['footprint']:.0f} m²"
+                    )
+            else:
+                st.warning("⚠️ Kein Entwurf aus dem Katalog passt auf die angegebene Grundstücksgröße.")
+        st.markdown("---")
+
     # Zentrierte Überschrift für 3D-Modell
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
         st.header("🏠 Ihr 3D-Hausmodell")
         st.markdown("Hier sehen Sie ein interaktives 3D-Modell basierend auf Ihren Präferenzen:")
     
-    # Sketchfab 3D-Modell einbetten
-    sketchfab_html = '''
-    <div class="sketchfab-embed-wrapper"> 
-        <iframe title="VIANNEY HOUSE 2" 
-                frameborder="0" 
-                allowfullscreen 
-                mozallowfullscreen="true" 
-                webkitallowfullscreen="true" 
-                allow="autoplay; fullscreen; xr-spatial-tracking" 
-                xr-spatial-tracking 
-                execution-while-out-viewport 
-                execution-while-not-rendered 
-                web-share 
-                src="https://sketchfab.com/models/b45403bf4f7849aebb61f7623c00b714/embed?autospin=1&camera=0"
-                style="width: 100%; height: 600px;">
-        </iframe> 
-        <p style="font-size: 13px; font-weight: normal; margin: 5px; color: #4A4A4A;"> 
-            <a href="https://sketchfab.com/3d-models/vianney-house-2-b45403bf4f7849aebb61f7623c00b714?utm_medium=embed&utm_campaign=share-popup&utm_content=b45403bf4f7849aebb61f7623c00b714" 
-               target="_blank" 
-               rel="nofollow" 
-               style="font-weight: bold; color: #1CAAD9;"> 
-               VIANNEY HOUSE 2 
-            </a> 
-            by 
-            <a href="https://sketchfab.com/fantecboisseau?utm_medium=embed&utm_campaign=share-popup&utm_content=b45403bf4f7849aebb61f7623c00b714" 
-               target="_blank" 
-               rel="nofollow" 
-               style="font-weight: bold; color: #1CAAD9;"> 
-               Fantec Boisseau 
-            </a> 
-            on 
-            <a href="https://sketchfab.com?utm_medium=embed&utm_campaign=share-popup&utm_content=b45403bf4f7849aebb61f7623c00b714" 
-               target="_blank" 
-               rel="nofollow" 
-               style="font-weight: bold; color: #1CAAD9;">
-               Sketchfab
-            </a>
-        </p>
-    </div>
-    '''
-    
-    # 3D-Modell anzeigen
-    st.components.v1.html(sketchfab_html, height=650)
+    # Massenmodell aus Grundstücksgröße und Bewertungen (lokal erzeugt und zwischengespeichert)
+    with span("modell"):
+        modell_parameter = model_parameters(
+            grundstuecks_groesse, [data["bewertung"] for data in antworten.values()]
+        )
+        st.components.v1.html(modell_als_html(modell_parameter), height=620)
+
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col2:
+        flaechen = floor_areas(layout(modell_parameter))
+        st.caption(" · ".join(
+            f"{name}: {flaeche:.0f} m²"
+            for name, flaeche in (
+                ("Wohnen", flaechen.get("wohnen")),
+                ("Arbeiten", flaechen.get("arbeiten")),
+                ("Gäste", flaechen.get("gaeste")),
+                ("Küche/Bad/Stauraum", flaechen.get("kern")),
+                ("Obergeschoss", flaechen.get("obergeschoss")),
+                ("Terrasse", flaechen.get("terrasse")),
+            )
+            if flaeche
+        ))
+        st.download_button(
+            "⬇️ Modell herunterladen (GLB)",
+            data=get_model_cache().get_model(modell_parameter),
+            file_name="hausmodell.glb",
+            mime="model/gltf-binary"
+        )
     
     # Zusätzliche Informationen zum Modell
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
         st.info("""
         🎯 **Bedienung des 3D-Modells:**
-        - **Drehen**: Linke Maustaste gedrückt halten und bewegen
-        - **Zoomen**: Mausrad oder Pinch-Geste auf Touchscreens
-        - **Verschieben**: Rechte Maustaste gedrückt halten und bewegen
-        - **Automatische Rotation**: Das Modell dreht sich automatisch
-        - **Vollbild**: Klicken Sie auf das Vollbild-Symbol im 3D-Viewer    """)
+        - **Drehen**: Linke Maustaste gedrückt halten und bewegen (oder mit dem Finger wischen)
+        - **Zoomen**: Mausrad
+        - **Automatische Rotation**: Das Modell dreht sich, bis Sie es bewegen
+        - **Farben**: Wohnen (sand), Arbeiten (blau), Gäste (rot), Küche/Bad/Stauraum (grau), Terrasse (braun)    """)
     
     # Buttons für Aktionen
     col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
@@ -336,17 +616,39 @@ Diese App hilft Ihnen dabei, Ihre Präferenzen für Ihr Traumhaus zu erfassen un
 - 🏠 3D-Hausmodell generieren
 
 **3D-Modell:**
-- Wird nach Bestätigung der Eingaben generiert
+- Wird nach Bestätigung der Eingaben aus Ihren Angaben erzeugt
 - Interaktive Steuerung mit Maus/Touch
 - Automatische Rotation aktiviert
-- Vollbild-Modus verfügbar
+- Als GLB-Datei herunterladbar
 
 **Hinweise:**
 - Für die Kartenfunktion wird eine Internetverbindung benötigt
-- Alle Eingaben werden nur lokal gespeichert
+- Bestätigte Eingaben (Adresse, Grundstücksgröße, Bewertungen) werden auf dem Server gespeichert
+- Sie werden anonym, ohne Adresse, für die Anzeige vergleichbarer Grundstücke genutzt
 - Das 3D-Modell lädt automatisch nach Bestätigung
 """)
 
 # Footer
 st.markdown("---")
-st.markdown("*Entwickelt für die Hausplanung - Alle Daten werden lokal verarbeitet*")
+st.markdown("*Entwickelt für die Hausplanung - Bestätigte Eingaben werden auf dem Server gespeichert und anonym für Vergleiche mit Grundstücken in der Nähe genutzt*")
+
+# Laufzeiten dieses Durchlaufs in der Seitenleiste (HOUSE_PLANNER_DEBUG_PANEL=1)
+laufzeiten = instrumentation.end_rerun()
+if settings.DEBUG_PANEL and laufzeiten:
+    sitzung = instrumentation.aggregate(st.session_state.setdefault("laufzeiten", {}), laufzeiten)
+    with st.sidebar.expander("⏱️ Laufzeiten", expanded=True):
+        st.caption("Aktueller Durchlauf")
+        st.table([
+            {"Abschnitt": name, "Dauer (ms)": f"{sekunden * 1000:.1f}"}
+            for name, sekunden in laufzeiten
+        ])
+        st.caption("Diese Sitzung")
+        st.table([
+            {
+                "Abschnitt": name,
+                "Anzahl": werte["anzahl"],
+                "Ø (ms)": f"{werte['summe'] / werte['anzahl'] * 1000:.1f}",
+                "Max (ms)": f"{werte['max'] * 1000:.1f}",
+            }
+            for name, werte in sitzung.items()
+        ])
@@ -0,0 +1,293 @@
+"""
+Lightweight timing instrumentation and a Prometheus metrics endpoint.
+
+Sections of the app are wrapped in `span(name)`. While instrumentation
+is disabled (the default), `span` returns a shared no-op context manager,
+so the cost is one function call and a flag check. Once `enable()` has
+been called, every span is observed in a per-section histogram and, if a
+rerun is being recorded on the current thread (`begin_rerun`), appended
+to that rerun's breakdown for the debug panel.
+
+Metrics are kept in the process-wide `REGISTRY` and rendered in the
+Prometheus text format by `start_metrics_server`. Values that live
+elsewhere (geocode cache counters, active sessions) are added as
+collector callbacks that are evaluated on every scrape.
+"""
+
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Obergrenzen der Histogramm-Buckets in Sekunden
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_enabled = False
+_local = threading.local()
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def is_enabled():
+    return _enabled
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with one series per label combination.
+    """
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # Labelwerte -> [Zähler je Bucket (+Inf zuletzt), Summe]
+        self._series = {}
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((values, list(counts), total) for values, (counts, total) in self._series.items())
+        for label_values, counts, total in series:
+            labels = list(zip(self.label_names, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    Histograms plus collector callbacks for counters and gauges.
+
+    A collector returns a list of (name, type, documentation, samples) with
+    samples as a list of (labels dict, value).
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def histogram(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Histogram(name, documentation, label_names, buckets)
+            return self._histograms[name]
+
+    def add_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def expose(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            histograms = list(self._histograms.values())
+            collectors = list(self._collectors)
+        lines = []
+        for histogram in histograms:
+            lines.extend(histogram.expose())
+        for collector in collectors:
+            try:
+                metrics = collector()
+            except Exception:
+                # Ein defekter Collector darf den Scrape nicht verhindern
+                continue
+            for name, metric_type, documentation, samples in metrics:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(sorted(labels.items()))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+SECTION_SECONDS = REGISTRY.histogram(
+    "house_planner_section_seconds", "Laufzeit einzelner Abschnitte des App-Skripts", ("section",)
+)
+RERUN_SECONDS = REGISTRY.histogram(
+    "house_planner_rerun_seconds", "Laufzeit vollständiger Skriptdurchläufe"
+)
+EXTERNAL_SECONDS = REGISTRY.histogram(
+    "house_planner_external_request_seconds", "Dauer von Anfragen an externe Dienste", ("service",)
+)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("name", "histogram", "started")
+
+    def __init__(self, name, histogram):
+        self.name = name
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        self.histogram.observe(elapsed, self.name)
+        rerun = getattr(_local, "rerun", None)
+        if rerun is not None and self.histogram is SECTION_SECONDS:
+            rerun.append((self.name, elapsed))
+        return False
+
+
+def span(name):
+    """Time the enclosed block as section `name` (no-op while disabled)."""
+    if not _enabled:
+        return _NOOP
+    return _Span(name, SECTION_SECONDS)
+
+
+def external_call(service):
+    """Time a request to an external `service` (no-op while disabled)."""
+    if not _enabled:
+        return _NOOP
+    return _Span(service, EXTERNAL_SECONDS)
+
+
+def begin_rerun():
+    """Start recording the spans of a script run on the current thread."""
+    if _enabled:
+        _local.rerun = []
+        _local.rerun_started = time.perf_counter()
+
+
+def end_rerun():
+    """
+    Stop recording and return the rerun's breakdown as a list of
+    (section, seconds), with the whole run last as "gesamt". Returns an
+    empty list if nothing was being recorded.
+    """
+    rerun = getattr(_local, "rerun", None)
+    if rerun is None:
+        return []
+    total = time.perf_counter() - _local.rerun_started
+    _local.rerun = None
+    RERUN_SECONDS.observe(total)
+    return rerun + [("gesamt", total)]
+
+
+def aggregate(totals, breakdown):
+    """
+    Fold a rerun breakdown into per-session `totals`
+    ({section: {"anzahl", "summe", "max"}}) in place.
+    """
+    for name, seconds in breakdown:
+        entry = totals.setdefault(name, {"anzahl": 0, "summe": 0.0, "max": 0.0})
+        entry["anzahl"] += 1
+        entry["summe"] += seconds
+        entry["max"] = max(entry["max"], seconds)
+    return totals
+
+
+class SessionTracker:
+    """
+    Count sessions seen within the last `timeout` seconds.
+    """
+
+    def __init__(self, timeout=300):
+        self.timeout = timeout
+        self._last_seen = {}
+        self._lock = threading.Lock()
+
+    def touch(self, session_id):
+        with self._lock:
+            self._last_seen[session_id] = time.monotonic()
+
+    def active(self):
+        cutoff = time.monotonic() - self.timeout
+        with self._lock:
+            # Abgelaufene Sitzungen beim Zählen gleich entfernen
+            self._last_seen = {key: seen for key, seen in self._last_seen.items() if seen >= cutoff}
+            return len(self._last_seen)
+
+    def collect(self):
+        return [("house_planner_active_sessions", "gauge",
+                 f"Sitzungen mit Aktivität in den letzten {self.timeout} Sekunden", [({}, self.active())])]
+
+
+def geocode_cache_collector(cache):
+    """Collector exposing the hit/miss counters of a `GeocodeCache`."""
+
+    def collect():
+        stats = cache.stats()
+        return [
+            ("house_planner_geocode_cache_hits_total", "counter", "Treffer im Geocoding-Cache",
+             [({"scope": "process"}, stats["hits"]), ({"scope": "shared"}, stats["shared_hits"])]),
+            ("house_planner_geocode_cache_misses_total", "counter", "Fehlschläge im Geocoding-Cache",
+             [({"scope": "process"}, stats["misses"]), ({"scope": "shared"}, stats["shared_misses"])]),
+            ("house_planner_geocode_cache_entries", "gauge", "Einträge im Geocoding-Cache",
+             [({}, stats["entries"])]),
+        ]
+
+    return collect
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    registry = None
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.expose().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(registry=REGISTRY, host="127.0.0.1", port=0):
+    """
+    Serve `registry` at /metrics in a daemon thread and return the server.
+    """
+    handler = type("MetricsRequestHandler", (_MetricsRequestHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,124 @@
+"""
+Map rendering for the plot location.
+
+The interactive map is rendered to a self-contained Leaflet HTML page
+once per (latitude, longitude, zoom, popup) and reused from the cache;
+the static mode composites OpenStreetMap tiles and the plot marker into
+a single PNG, which is much lighter for users who never pan the map.
+Its tiles are downloaded in parallel, through the tile proxy's cache
+when one is passed in.
+"""
+
+import io
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import folium
+import requests
+from PIL import Image, ImageDraw
+
+import settings
+
+TILE_SIZE = 256
+ATTRIBUTION = "© OpenStreetMap-Mitwirkende"
+# Parallele Kachel-Downloads für die statische Karte
+STATIC_MAP_WORKERS = 6
+
+_session = requests.Session()
+_session.headers["User-Agent"] = settings.NOMINATIM_USER_AGENT
+
+
+def build_map(latitude, longitude, zoom, popup, width=700, height=400):
+    """
+    Create the folium map with the plot marker.
+    """
+    # Karte erstellen
+    m = folium.Map(
+        location=[latitude, longitude],
+        zoom_start=zoom,
+        width=width,
+        height=height,
+        tiles=settings.TILE_URL,
+        attr=ATTRIBUTION
+    )
+
+    # Marker für das Grundstück hinzufügen
+    folium.Marker(
+        [latitude, longitude],
+        popup=popup,
+        tooltip="Ihr Grundstück",
+        icon=folium.Icon(color='red', icon='home')
+    ).add_to(m)
+    return m
+
+
+def render_map_html(latitude, longitude, zoom, popup, width=700, height=400):
+    """
+    Render the interactive map to a standalone HTML page.
+    """
+    return build_map(latitude, longitude, zoom, popup, width, height).get_root().render()
+
+
+def tile_position(latitude, longitude, zoom):
+    """
+    Return the fractional (x, y) tile coordinates of a point (Web Mercator).
+    """
+    n = 2 ** zoom
+    lat_rad = math.radians(latitude)
+    x = (longitude + 180.0) / 360.0 * n
+    y = (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n
+    return x, y
+
+
+def fetch_tile(zoom, x, y):
+    """
+    Download one tile as PNG bytes.
+    """
+    url = settings.TILE_URL.format(z=zoom, x=x, y=y, s="a")
+    response = _session.get(url, timeout=10)
+    response.raise_for_status()
+    return response.content
+
+
+def render_static_map(latitude, longitude, zoom, width=700, height=400, tiles=None):
+    """
+    Composite the tiles around the plot and the marker into one PNG image.
+
+    With `tiles` (a `tile_proxy.TileCache`), tiles come from its cache
+    instead of being downloaded from `settings.TILE_URL`.
+    """
+    center_x, center_y = tile_position(latitude, longitude, zoom)
+    left = center_x * TILE_SIZE - width / 2
+    top = center_y * TILE_SIZE - height / 2
+    n = 2 ** zoom
+
+    positions = [
+        (tile_x, tile_y)
+        for tile_y in range(int(top // TILE_SIZE), int((top + height - 1) // TILE_SIZE) + 1)
+        if 0 <= tile_y < n
+        for tile_x in range(int(left // TILE_SIZE), int((left + width - 1) // TILE_SIZE) + 1)
+    ]
+    fetch = tiles.get_tile if tiles is not None else fetch_tile
+    with ThreadPoolExecutor(max_workers=STATIC_MAP_WORKERS) as executor:
+        data = list(executor.map(lambda position: fetch(zoom, position[0] % n, position[1]), positions))
+
+    image = Image.new("RGB", (width, height), "#e5e3df")
+    for (tile_x, tile_y), tile_data in zip(positions, data):
+        tile = Image.open(io.BytesIO(tile_data)).convert("RGB")
+        image.paste(tile, (round(tile_x * TILE_SIZE - left), round(tile_y * TILE_SIZE - top)))
+
+    # Marker als Stecknadel in der Bildmitte
+    draw = ImageDraw.Draw(image)
+    cx, cy = width // 2, height // 2
+    draw.polygon([(cx - 9, cy - 22), (cx + 9, cy - 22), (cx, cy)], fill="#d63e2a")
+    draw.ellipse((cx - 12, cy - 36, cx + 12, cy - 12), fill="#d63e2a", outline="white", width=2)
+    draw.ellipse((cx - 4, cy - 28, cx + 4, cy - 20), fill="white")
+
+    # Quellenangabe unten rechts
+    text_width = draw.textlength(ATTRIBUTION)
+    draw.rectangle((width - text_width - 8, height - 16, width, height), fill=(255, 255, 255))
+    draw.text((width - text_width - 4, height - 14), ATTRIBUTION, fill="#333333")
+
+    output = io.BytesIO()
+    image.save(output, format="PNG", optimize=True)
+    return output.getvalue()
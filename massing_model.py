@@ -0,0 +1,270 @@
+"""
+Procedural massing model of the house as binary glTF (GLB).
+
+The plot size and the ratings are reduced to a handful of rounded
+parameters, from which a simple block model is laid out: an open living
+area (wider and double height the more question 2 matters), next to it
+an optional office and guest room and a core with kitchen, bathroom and
+storage, a terrace in front of the living area and an upper floor above
+the rest. All blocks are scaled instances of one shared unit cube, so a
+model is only a few kilobytes.
+
+Models are cached in a `DiskLRUCache` keyed by their parameters, so
+repeated requests with the same inputs only cost a cache lookup.
+"""
+
+import json
+import math
+import struct
+
+import numpy as np
+
+import settings
+from disk_cache import DiskLRUCache
+from planner_core import FRAGEN
+
+# Bei Änderungen am Layout oder am Dateiformat erhöhen, damit alte Modelle nicht mehr passen
+MODEL_VERSION = 1
+
+# Grundfläche des Erdgeschosses (m²); ohne Grundstücksgröße wird DEFAULT_FOOTPRINT angenommen
+MIN_FOOTPRINT = 60.0
+MAX_FOOTPRINT = 200.0
+DEFAULT_FOOTPRINT = 110.0
+# Seitenverhältnis des Baukörpers (Breite / Tiefe)
+ASPECT_RATIO = 1.6
+STOREY_HEIGHT = 2.8
+MIN_LIVING_WIDTH = 4.0
+# Grundfläche von Arbeits-/Gästezimmer (plus 2 m² je Bewertungspunkt) und Mindesttiefen
+ROOM_AREA = 6.0
+MIN_ROOM_DEPTH = 3.0
+MIN_CORE_DEPTH = 3.0
+
+COLORS = {
+    "grundstueck": (0.55, 0.72, 0.45),
+    "wohnen": (0.93, 0.86, 0.70),
+    "kern": (0.80, 0.80, 0.82),
+    "arbeiten": (0.60, 0.74, 0.88),
+    "gaeste": (0.86, 0.66, 0.62),
+    "obergeschoss": (0.95, 0.95, 0.93),
+    "terrasse": (0.62, 0.52, 0.42),
+}
+
+
+def _round(value, step=0.5):
+    return round(value / step) * step
+
+
+def model_parameters(grundstuecks_groesse, bewertungen, coverage=None):
+    """
+    Reduce the inputs to the parameters the model depends on.
+
+    `bewertungen` are the ten ratings in question order. Values are rounded
+    so that similar inputs share one cached model.
+    """
+    if len(bewertungen) != len(FRAGEN):
+        raise ValueError(f"Es werden {len(FRAGEN)} Bewertungen erwartet")
+    coverage = settings.SITE_COVERAGE if coverage is None else coverage
+    if grundstuecks_groesse and grundstuecks_groesse > 0:
+        footprint = min(max(grundstuecks_groesse * coverage, MIN_FOOTPRINT), MAX_FOOTPRINT)
+    else:
+        footprint = DEFAULT_FOOTPRINT
+    return {
+        "grundstueck": _round(float(grundstuecks_groesse or 0), 10.0),
+        "grundflaeche": _round(footprint, 5.0),
+        "wohnen": int(bewertungen[1]),
+        "arbeiten": int(bewertungen[2]),
+        "terrasse": int(bewertungen[3]),
+        "gaeste": int(bewertungen[7]),
+    }
+
+
+def layout(parameters):
+    """
+    Lay out the blocks of the model.
+
+    Returns a list of blocks {"name", "position", "groesse"} in meters,
+    with `position` the minimum corner (x, y, z) and `groesse` the extent
+    along x, y (up) and z. The garden side faces +z.
+    """
+    depth = _round(math.sqrt(parameters["grundflaeche"] / ASPECT_RATIO))
+    width = _round(parameters["grundflaeche"] / depth)
+
+    # Wohnbereich über die ganze Tiefe; daneben Arbeiten und Gäste nebeneinander
+    # zur Gartenseite und der Kern (Küche, Bad, Stauraum) dahinter
+    living_width = max(width * (0.45 + 0.05 * (parameters["wohnen"] - 3)), MIN_LIVING_WIDTH)
+    side_width = width - living_width
+    rooms = [
+        (name, ROOM_AREA + 2.0 * parameters[name])
+        for name in ("arbeiten", "gaeste")
+        if parameters[name] >= 3
+    ]
+    room_area = sum(area for _, area in rooms)
+    room_depth = min(max(room_area / side_width, MIN_ROOM_DEPTH), depth - MIN_CORE_DEPTH) if rooms else 0.0
+
+    # Offener Wohnbereich wird bei hoher Bewertung zweigeschossig (Galerie)
+    living_height = 2 * STOREY_HEIGHT if parameters["wohnen"] >= 4 else STOREY_HEIGHT
+    blocks = [{"name": "wohnen", "position": (0.0, 0.0, 0.0), "groesse": (living_width, living_height, depth)}]
+    x = living_width
+    for name, area in rooms:
+        room_width = side_width * area / room_area
+        blocks.append({
+            "name": name,
+            "position": (x, 0.0, depth - room_depth),
+            "groesse": (room_width, STOREY_HEIGHT, room_depth),
+        })
+        x += room_width
+    blocks.append({
+        "name": "kern",
+        "position": (living_width, 0.0, 0.0),
+        "groesse": (side_width, STOREY_HEIGHT, depth - room_depth),
+    })
+    blocks.append({
+        "name": "obergeschoss",
+        "position": (living_width, STOREY_HEIGHT, 0.0),
+        "groesse": (side_width, STOREY_HEIGHT, depth),
+    })
+    if parameters["terrasse"] >= 2:
+        terrace_depth = 1.5 + 0.75 * parameters["terrasse"]
+        blocks.append({
+            "name": "terrasse",
+            "position": (0.0, 0.0, depth),
+            "groesse": (living_width, 0.15, terrace_depth),
+        })
+
+    # Grundstück als flache Platte, mindestens so groß wie Haus und Terrasse plus Rand
+    extent_x = width
+    extent_z = max(block["position"][2] + block["groesse"][2] for block in blocks)
+    side = max(math.sqrt(parameters["grundstueck"]), extent_x + 6.0, extent_z + 6.0)
+    blocks.insert(0, {
+        "name": "grundstueck",
+        "position": ((extent_x - side) / 2, -0.05, (extent_z - side) / 2),
+        "groesse": (side, 0.05, side),
+    })
+    return blocks
+
+
+def _unit_cube():
+    """Positions, normals and indices of a cube from (0,0,0) to (1,1,1) with flat faces."""
+    faces = [
+        # Normale, vier Ecken gegen den Uhrzeigersinn von außen gesehen
+        ((1, 0, 0), [(1, 0, 0), (1, 1, 0), (1, 1, 1), (1, 0, 1)]),
+        ((-1, 0, 0), [(0, 0, 1), (0, 1, 1), (0, 1, 0), (0, 0, 0)]),
+        ((0, 1, 0), [(0, 1, 1), (1, 1, 1), (1, 1, 0), (0, 1, 0)]),
+        ((0, -1, 0), [(0, 0, 0), (1, 0, 0), (1, 0, 1), (0, 0, 1)]),
+        ((0, 0, 1), [(0, 0, 1), (1, 0, 1), (1, 1, 1), (0, 1, 1)]),
+        ((0, 0, -1), [(1, 0, 0), (0, 0, 0), (0, 1, 0), (1, 1, 0)]),
+    ]
+    positions, normals, indices = [], [], []
+    for normal, corners in faces:
+        start = len(positions)
+        positions.extend(corners)
+        normals.extend([normal] * 4)
+        indices.extend([start, start + 1, start + 2, start, start + 2, start + 3])
+    return (
+        np.array(positions, dtype=np.float32),
+        np.array(normals, dtype=np.float32),
+        np.array(indices, dtype=np.uint16),
+    )
+
+
+def _pad(data, fill=b"\x00"):
+    return data + fill * (-len(data) % 4)
+
+
+def build_glb(blocks):
+    """
+    Encode `blocks` (as returned by `layout`) as a GLB file.
+
+    The unit cube is stored once; every block is a node that scales and
+    translates it, with one mesh per material.
+    """
+    positions, normals, indices = _unit_cube()
+    binary = positions.tobytes() + normals.tobytes() + indices.tobytes()
+
+    names = list(dict.fromkeys(block["name"] for block in blocks))
+    gltf = {
+        "asset": {"version": "2.0", "generator": f"house_planner massing_model v{MODEL_VERSION}"},
+        "scene": 0,
+        "scenes": [{"nodes": list(range(len(blocks)))}],
+        "nodes": [
+            {
+                "name": block["name"],
+                "mesh": names.index(block["name"]),
+                "translation": [round(float(v), 3) for v in block["position"]],
+                "scale": [round(float(v), 3) for v in block["groesse"]],
+            }
+            for block in blocks
+        ],
+        "meshes": [
+            {"name": name, "primitives": [{"attributes": {"POSITION": 0, "NORMAL": 1}, "indices": 2, "material": i}]}
+            for i, name in enumerate(names)
+        ],
+        "materials": [
+            {
+                "name": name,
+                "pbrMetallicRoughness": {
+                    "baseColorFactor": list(COLORS.get(name, (0.8, 0.8, 0.8))) + [1.0],
+                    "metallicFactor": 0.0,
+                    "roughnessFactor": 0.9,
+                },
+            }
+            for name in names
+        ],
+        "buffers": [{"byteLength": len(binary)}],
+        "bufferViews": [
+            {"buffer": 0, "byteOffset": 0, "byteLength": positions.nbytes, "target": 34962},
+            {"buffer": 0, "byteOffset": positions.nbytes, "byteLength": normals.nbytes, "target": 34962},
+            {"buffer": 0, "byteOffset": positions.nbytes + normals.nbytes, "byteLength": indices.nbytes,
+             "target": 34963},
+        ],
+        "accessors": [
+            {"bufferView": 0, "componentType": 5126, "count": len(positions), "type": "VEC3",
+             "min": [0, 0, 0], "max": [1, 1, 1]},
+            {"bufferView": 1, "componentType": 5126, "count": len(normals), "type": "VEC3"},
+            {"bufferView": 2, "componentType": 5123, "count": len(indices), "type": "SCALAR"},
+        ],
+    }
+
+    json_chunk = _pad(json.dumps(gltf, separators=(",", ":")).encode("utf-8"), b" ")
+    bin_chunk = _pad(binary)
+    length = 12 + 8 + len(json_chunk) + 8 + len(bin_chunk)
+    return b"".join([
+        struct.pack("<4sII", b"glTF", 2, length),
+        struct.pack("<I4s", len(json_chunk), b"JSON"), json_chunk,
+        struct.pack("<I4s", len(bin_chunk), b"BIN\x00"), bin_chunk,
+    ])
+
+
+def floor_areas(blocks):
+    """Floor area per block in m², without the plot itself."""
+    return {
+        block["name"]: round(block["groesse"][0] * block["groesse"][2], 1)
+        for block in blocks
+        if block["name"] != "grundstueck"
+    }
+
+
+class MassingModelCache:
+    """
+    Generated GLB models in a size-bounded disk cache, keyed by their parameters.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    @classmethod
+    def from_settings(cls):
+        return cls(DiskLRUCache(settings.MODEL_CACHE_DIR, settings.MODEL_CACHE_MAX_BYTES))
+
+    def get_model(self, parameters):
+        """
+        Return the GLB bytes for `parameters`, generating and storing the
+        model on a cache miss.
+        """
+        key = f"v{MODEL_VERSION}:" + json.dumps(parameters, sort_keys=True)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached[0]
+        glb = build_glb(layout(parameters))
+        self.cache.put(key, glb, {"parameter": parameters})
+        return glb
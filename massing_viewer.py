@@ -0,0 +1,195 @@
+"""
+Minimal self-contained WebGL viewer for the GLB models of massing_model.py.
+
+The model is embedded as base64 in a single HTML page with a small inline
+script; nothing is loaded from external servers. The script understands
+exactly what `massing_model.build_glb` writes: nodes with translation
+and scale, one float position/normal accessor pair, uint16 indices and a
+base color per material. Drag rotates, the mouse wheel zooms, and the
+model turns slowly until the first interaction.
+"""
+
+import base64
+import string
+
+_TEMPLATE = string.Template("""
+<div style="position: relative; width: 100%; height: ${height}px;">
+  <canvas id="modell" style="width: 100%; height: 100%; display: block; border-radius: 8px;
+          background: #eef3f8; cursor: grab; touch-action: none;"></canvas>
+  <p id="fehler" style="display: none; position: absolute; top: 40%; width: 100%; text-align: center;
+     font-family: sans-serif; color: #4A4A4A;">WebGL wird von diesem Browser nicht unterstützt.</p>
+</div>
+<script>
+(function () {
+  const glb = Uint8Array.from(atob("${model}"), c => c.charCodeAt(0));
+  const view = new DataView(glb.buffer);
+  const jsonLength = view.getUint32(12, true);
+  const gltf = JSON.parse(new TextDecoder().decode(glb.subarray(20, 20 + jsonLength)));
+  const binStart = 20 + jsonLength + 8;
+
+  function accessor(index) {
+    const a = gltf.accessors[index];
+    const v = gltf.bufferViews[a.bufferView];
+    const offset = binStart + (v.byteOffset || 0) + (a.byteOffset || 0);
+    const count = a.count * (a.type === "VEC3" ? 3 : 1);
+    return a.componentType === 5126
+      ? new Float32Array(glb.buffer.slice(offset, offset + count * 4))
+      : new Uint16Array(glb.buffer.slice(offset, offset + count * 2));
+  }
+
+  const canvas = document.getElementById("modell");
+  const gl = canvas.getContext("webgl", {antialias: true});
+  if (!gl) {
+    document.getElementById("fehler").style.display = "block";
+    return;
+  }
+
+  function shader(type, source) {
+    const s = gl.createShader(type);
+    gl.shaderSource(s, source);
+    gl.compileShader(s);
+    return s;
+  }
+  const program = gl.createProgram();
+  gl.attachShader(program, shader(gl.VERTEX_SHADER, `
+    attribute vec3 position;
+    attribute vec3 normal;
+    uniform mat4 viewProjection;
+    uniform vec3 translation;
+    uniform vec3 scale;
+    varying vec3 vNormal;
+    void main() {
+      vNormal = normal;
+      gl_Position = viewProjection * vec4(position * scale + translation, 1.0);
+    }`));
+  gl.attachShader(program, shader(gl.FRAGMENT_SHADER, `
+    precision mediump float;
+    uniform vec3 color;
+    varying vec3 vNormal;
+    void main() {
+      float light = max(dot(normalize(vNormal), normalize(vec3(0.4, 0.9, 0.6))), 0.0);
+      gl_FragColor = vec4(color * (0.45 + 0.55 * light), 1.0);
+    }`));
+  gl.linkProgram(program);
+  gl.useProgram(program);
+
+  // Alle Meshes teilen sich dieselben Accessoren (Einheitswürfel)
+  const primitive = gltf.meshes[0].primitives[0];
+  function attribute(name, index) {
+    const buffer = gl.createBuffer();
+    gl.bindBuffer(gl.ARRAY_BUFFER, buffer);
+    gl.bufferData(gl.ARRAY_BUFFER, accessor(index), gl.STATIC_DRAW);
+    const location = gl.getAttribLocation(program, name);
+    gl.enableVertexAttribArray(location);
+    gl.vertexAttribPointer(location, 3, gl.FLOAT, false, 0, 0);
+  }
+  attribute("position", primitive.attributes.POSITION);
+  attribute("normal", primitive.attributes.NORMAL);
+  const indices = accessor(primitive.indices);
+  gl.bindBuffer(gl.ELEMENT_ARRAY_BUFFER, gl.createBuffer());
+  gl.bufferData(gl.ELEMENT_ARRAY_BUFFER, indices, gl.STATIC_DRAW);
+
+  const uniforms = {};
+  for (const name of ["viewProjection", "translation", "scale", "color"]) {
+    uniforms[name] = gl.getUniformLocation(program, name);
+  }
+
+  const nodes = gltf.nodes.map(node => {
+    const material = gltf.materials[gltf.meshes[node.mesh].primitives[0].material];
+    return {
+      translation: node.translation || [0, 0, 0],
+      scale: node.scale || [1, 1, 1],
+      color: material.pbrMetallicRoughness.baseColorFactor.slice(0, 3),
+    };
+  });
+
+  // Kamera auf das Haus ausrichten (Grundstück als erster Knoten ausgenommen)
+  const houseNodes = nodes.length > 1 ? nodes.slice(1) : nodes;
+  const low = [0, 1, 2].map(i => Math.min(...houseNodes.map(n => n.translation[i])));
+  const high = [0, 1, 2].map(i => Math.max(...houseNodes.map(n => n.translation[i] + n.scale[i])));
+  const center = [0, 1, 2].map(i => (low[i] + high[i]) / 2);
+  const radius = Math.hypot(high[0] - low[0], high[1] - low[1], high[2] - low[2]) / 2;
+
+  let yaw = 0.6, pitch = 0.5, distance = radius * 2.6, spinning = true, dragging = null;
+
+  function perspective(fovy, aspect, near, far) {
+    const f = 1 / Math.tan(fovy / 2);
+    return [f / aspect, 0, 0, 0, 0, f, 0, 0, 0, 0, (far + near) / (near - far), -1,
+            0, 0, 2 * far * near / (near - far), 0];
+  }
+  function lookAt(eye, target) {
+    const sub = (a, b) => a.map((v, i) => v - b[i]);
+    const norm = a => { const l = Math.hypot(...a); return a.map(v => v / l); };
+    const cross = (a, b) => [a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0]];
+    const dot = (a, b) => a[0] * b[0] + a[1] * b[1] + a[2] * b[2];
+    const z = norm(sub(eye, target));
+    const x = norm(cross([0, 1, 0], z));
+    const y = cross(z, x);
+    return [x[0], y[0], z[0], 0, x[1], y[1], z[1], 0, x[2], y[2], z[2], 0,
+            -dot(x, eye), -dot(y, eye), -dot(z, eye), 1];
+  }
+  function multiply(a, b) {
+    const out = new Array(16).fill(0);
+    for (let c = 0; c < 4; c++)
+      for (let r = 0; r < 4; r++)
+        for (let k = 0; k < 4; k++) out[c * 4 + r] += a[k * 4 + r] * b[c * 4 + k];
+    return out;
+  }
+
+  canvas.addEventListener("pointerdown", e => {
+    spinning = false;
+    dragging = [e.clientX, e.clientY];
+    canvas.setPointerCapture(e.pointerId);
+  });
+  canvas.addEventListener("pointermove", e => {
+    if (!dragging) return;
+    yaw -= (e.clientX - dragging[0]) * 0.01;
+    pitch = Math.min(Math.max(pitch + (e.clientY - dragging[1]) * 0.01, 0.05), 1.5);
+    dragging = [e.clientX, e.clientY];
+  });
+  canvas.addEventListener("pointerup", () => { dragging = null; });
+  canvas.addEventListener("wheel", e => {
+    e.preventDefault();
+    spinning = false;
+    distance = Math.min(Math.max(distance * Math.exp(e.deltaY * 0.001), radius * 1.2), radius * 8);
+  }, {passive: false});
+
+  gl.enable(gl.DEPTH_TEST);
+  gl.clearColor(0.933, 0.953, 0.973, 1);
+
+  function frame() {
+    const ratio = window.devicePixelRatio || 1;
+    const width = Math.round(canvas.clientWidth * ratio), height = Math.round(canvas.clientHeight * ratio);
+    if (canvas.width !== width || canvas.height !== height) {
+      canvas.width = width;
+      canvas.height = height;
+    }
+    gl.viewport(0, 0, width, height);
+    gl.clear(gl.COLOR_BUFFER_BIT | gl.DEPTH_BUFFER_BIT);
+
+    if (spinning) yaw += 0.003;
+    const eye = [
+      center[0] + distance * Math.cos(pitch) * Math.sin(yaw),
+      center[1] + distance * Math.sin(pitch),
+      center[2] + distance * Math.cos(pitch) * Math.cos(yaw),
+    ];
+    const viewProjection = multiply(
+      perspective(0.8, width / Math.max(height, 1), radius * 0.05, radius * 40), lookAt(eye, center));
+    gl.uniformMatrix4fv(uniforms.viewProjection, false, new Float32Array(viewProjection));
+    for (const node of nodes) {
+      gl.uniform3fv(uniforms.translation, node.translation);
+      gl.uniform3fv(uniforms.scale, node.scale);
+      gl.uniform3fv(uniforms.color, node.color);
+      gl.drawElements(gl.TRIANGLES, indices.length, gl.UNSIGNED_SHORT, 0);
+    }
+    requestAnimationFrame(frame);
+  }
+  requestAnimationFrame(frame);
+})();
+</script>
+""")
+
+
+def viewer_html(glb, height=600):
+    """Return an HTML page that renders the GLB bytes `glb`."""
+    return _TEMPLATE.substitute(model=base64.b64encode(glb).decode("ascii"), height=int(height))
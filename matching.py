@@ -0,0 +1,144 @@
+"""
+Matching of questionnaire ratings against a catalog of house designs.
+
+Every design has a score on the 1-5 scale for each of the ten questions
+and a footprint in m². The catalog is held as one contiguous float32
+matrix, and a session is scored against all designs in a single
+vectorized pass:
+
+    distance = sum_i w_i * (f_i - r_i)²   with   w = r / sum(r)
+
+i.e. designs that match the ratings on the questions the user cares most
+about rank highest. The weighted squared distance expands into two
+matrix products, so many sessions can be scored with one BLAS call.
+Designs whose footprint exceeds the buildable part of the plot are
+masked out in the same pass.
+"""
+
+import csv
+
+import numpy as np
+
+import settings
+from planner_core import FRAGEN
+
+# Maximaler Abstand zweier Bewertungen auf der Skala 1-5
+_MAX_DISTANCE = 4.0 ** 2
+# Obergrenze für die Zwischenmatrix (Sitzungen x Entwürfe) im Batch
+_BATCH_CELLS = 8_000_000
+
+
+class DesignCatalog:
+    """
+    House designs as contiguous NumPy arrays.
+
+    `features` is a (designs, 10) float32 matrix in question order,
+    `footprints` the ground area of each design in m².
+    """
+
+    def __init__(self, ids, names, features, footprints):
+        self.ids = np.asarray(ids)
+        self.names = np.asarray(names)
+        self.features = np.ascontiguousarray(features, dtype=np.float32)
+        self.footprints = np.ascontiguousarray(footprints, dtype=np.float32)
+        if self.features.shape != (len(self.ids), len(FRAGEN)):
+            raise ValueError(f"Merkmalsmatrix muss die Form ({len(self.ids)}, {len(FRAGEN)}) haben")
+        # Für die Zerlegung des gewichteten Abstands vorberechnet
+        self._features_squared = self.features ** 2
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a catalog from .npz (arrays ids, names, features, footprints)
+        or from CSV (columns id, name, footprint, frage_1 ... frage_10).
+        """
+        if path.endswith(".npz"):
+            with np.load(path, allow_pickle=False) as data:
+                return cls(data["ids"], data["names"], data["features"], data["footprints"])
+
+        ids, names, footprints, features = [], [], [], []
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                ids.append(row["id"])
+                names.append(row["name"])
+                footprints.append(float(row["footprint"]))
+                features.append([float(row[f"frage_{i}"]) for i in range(1, len(FRAGEN) + 1)])
+        return cls(ids, names, np.array(features, dtype=np.float32).reshape(-1, len(FRAGEN)), footprints)
+
+    def save(self, path):
+        """Save the catalog as .npz for fast loading."""
+        np.savez(path, ids=self.ids.astype(str), names=self.names.astype(str),
+                 features=self.features, footprints=self.footprints)
+
+    def _distances(self, ratings, plot_sizes, coverage):
+        """
+        Weighted squared distance of each session (rows) to each design
+        (columns); designs that don't fit the plot get +inf.
+        """
+        ratings = np.asarray(ratings, dtype=np.float32).reshape(-1, len(FRAGEN))
+        weights = ratings / ratings.sum(axis=1, keepdims=True)
+        distance = weights @ self._features_squared.T
+        distance -= (2.0 * weights * ratings) @ self.features.T
+        distance += (weights * ratings ** 2).sum(axis=1, keepdims=True)
+
+        buildable = np.asarray(plot_sizes, dtype=np.float32).reshape(-1, 1) * coverage
+        distance[self.footprints[np.newaxis, :] > buildable] = np.inf
+        return distance
+
+    def _top_k(self, distance, k):
+        """
+        Indices and similarity scores in [0, 1] of the `k` nearest designs per row.
+        """
+        k = min(k, distance.shape[1])
+        top = np.argpartition(distance, k - 1, axis=1)[:, :k]
+        top_distance = np.take_along_axis(distance, top, axis=1)
+        order = np.argsort(top_distance, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_distance = np.maximum(np.take_along_axis(top_distance, order, axis=1), 0.0)
+        return top, 1.0 - np.sqrt(top_distance / _MAX_DISTANCE)
+
+    def _as_results(self, indices, scores):
+        return [
+            {
+                "id": str(self.ids[i]),
+                "name": str(self.names[i]),
+                "footprint": float(self.footprints[i]),
+                "score": float(score)
+            }
+            for i, score in zip(indices, scores)
+            if np.isfinite(score)
+        ]
+
+    def top_k(self, ratings, grundstuecks_groesse, k=5, coverage=None):
+        """
+        Return the `k` best matching designs that fit on the plot.
+
+        `ratings` are the ten ratings in question order, `coverage` the share
+        of the plot that may be built on (Grundflächenzahl).
+        """
+        coverage = settings.SITE_COVERAGE if coverage is None else coverage
+        indices, scores = self._top_k(self._distances(ratings, grundstuecks_groesse, coverage), k)
+        return self._as_results(indices[0], scores[0])
+
+    def top_k_batch(self, ratings, plot_sizes, k=5, coverage=None):
+        """
+        Score many sessions at once.
+
+        `ratings` is a (sessions, 10) matrix, `plot_sizes` a vector of plot
+        sizes. Sessions are processed in blocks to bound memory. Returns one
+        result list per session, as from `top_k`.
+        """
+        coverage = settings.SITE_COVERAGE if coverage is None else coverage
+        ratings = np.asarray(ratings, dtype=np.float32).reshape(-1, len(FRAGEN))
+        plot_sizes = np.asarray(plot_sizes, dtype=np.float32)
+        block = max(1, _BATCH_CELLS // max(len(self), 1))
+
+        results = []
+        for start in range(0, len(ratings), block):
+            distance = self._distances(ratings[start:start + block], plot_sizes[start:start + block], coverage)
+            indices, top_scores = self._top_k(distance, k)
+            results.extend(self._as_results(i, s) for i, s in zip(indices, top_scores))
+        return results
@@ -0,0 +1,85 @@
+"""
+UI-independent core of the house planner.
+
+Holds the questionnaire, the ranking of answers for the summary and the
+assembly of a planning result, so that the Streamlit app and the batch
+pipeline (batch_planner.py) produce identical results.
+"""
+
+# Liste der Fragen
+FRAGEN = [
+    "Wie wichtig ist es Ihnen, mit Sonnenschein im Fenster frühstücken zu können?",
+    "Wie wichtig ist Ihnen ein großer, offener Wohnbereich?",
+    "Wie wichtig ist Ihnen ein separates Arbeitszimmer/Home Office?",
+    "Wie wichtig ist Ihnen ein direkter Zugang zur Terrasse/Garten vom Wohnbereich?",
+    "Wie wichtig ist Ihnen eine moderne, offene Küche?",
+    "Wie wichtig ist Ihnen viel natürliches Licht in den Räumen?",
+    "Wie wichtig ist Ihnen die Privatsphäre gegenüber Nachbarn?",
+    "Wie wichtig ist Ihnen ein Gästezimmer?",
+    "Wie wichtig ist Ihnen eine energieeffiziente Bauweise?",
+    "Wie wichtig ist Ihnen ausreichend Stauraum/Abstellmöglichkeiten?"
+]
+
+# Bewertungsskala
+BEWERTUNG_OPTIONEN = {
+    1: "1 - Unwichtig",
+    2: "2 - Wenig wichtig",
+    3: "3 - Neutral",
+    4: "4 - Wichtig",
+    5: "5 - Sehr wichtig"
+}
+
+
+def build_answers(bewertungen):
+    """
+    Build the answers dict from ten ratings.
+
+    `bewertungen` is either a sequence of ten ratings in question order or
+    a mapping with the keys "frage_1" ... "frage_10".
+    """
+    if isinstance(bewertungen, dict):
+        bewertungen = [bewertungen[f"frage_{i}"] for i in range(1, len(FRAGEN) + 1)]
+    if len(bewertungen) != len(FRAGEN):
+        raise ValueError(f"Es werden {len(FRAGEN)} Bewertungen erwartet, nicht {len(bewertungen)}")
+
+    antworten = {}
+    for i, (frage, bewertung) in enumerate(zip(FRAGEN, bewertungen), 1):
+        bewertung = int(bewertung)
+        if bewertung not in BEWERTUNG_OPTIONEN:
+            raise ValueError(f"Ungültige Bewertung für frage_{i}: {bewertung}")
+        antworten[f"frage_{i}"] = {
+            "frage": frage,
+            "bewertung": bewertung
+        }
+    return antworten
+
+
+def rank_answers(antworten):
+    """
+    Sort answers by rating, most important first.
+
+    Returns a list of (key, answer) pairs; the sort is stable, so equally
+    rated questions keep their questionnaire order.
+    """
+    return sorted(antworten.items(), key=lambda x: x[1]['bewertung'], reverse=True)
+
+
+def build_result(grundstuecks_groesse, adresse, location_data, antworten):
+    """
+    Assemble the JSON-serializable result of one planning session.
+    """
+    return {
+        "grundstuecks_groesse": grundstuecks_groesse,
+        "adresse": adresse,
+        "standort": location_data,
+        "bewertungen": {key: data["bewertung"] for key, data in antworten.items()},
+        "rangfolge": [
+            {
+                "key": key,
+                "frage": data["frage"],
+                "bewertung": data["bewertung"],
+                "bewertung_text": BEWERTUNG_OPTIONEN[data["bewertung"]]
+            }
+            for key, data in rank_answers(antworten)
+        ]
+    }
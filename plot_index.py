@@ -0,0 +1,468 @@
+"""
+In-process spatial index of geocoded plots for neighborhood queries.
+
+Plots are bucketed into a regular latitude/longitude grid. The bulk of
+the points lives in NumPy arrays sorted by grid cell, so the cells of one
+grid row that overlap a query form a contiguous key range: a radius query
+is one vectorized `searchsorted` over the affected rows followed by an
+exact haversine filter of the candidates. New plots go into a small
+append buffer that is scanned directly and merged into the sorted arrays
+once it is full. k-nearest queries widen the radius until enough plots
+are found.
+
+The index can be saved as a .npz snapshot and reloaded without a
+rebuild; `sync_from_store` then only adds submissions newer than the
+snapshot. `keep_snapshot` writes the snapshot after catching up, at a
+fixed interval and at exit, so a restart replays only the submissions of
+the last interval.
+
+    python plot_index.py build
+    python plot_index.py leads --adresse "Musterstraße 1, 12345 Musterstadt" --radius-km 10
+"""
+
+import argparse
+import atexit
+import csv
+import logging
+import math
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+import settings
+from planner_core import FRAGEN
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+# Länge eines Breitengrads in km
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# Einfügepuffer, der beim Erreichen dieser Größe in die sortierten Arrays übernommen wird
+BUFFER_SIZE = 4096
+# Spalten, die der Abgleich aus dem SubmissionStore liest (ohne `ergebnis`)
+_STORE_COLUMNS = ["adresse", "latitude", "longitude", "grundstuecks_groesse"] + [
+    f"frage_{i}" for i in range(1, len(FRAGEN) + 1)
+]
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """Great-circle distance in km from one point to arrays of points."""
+    lat1, lon1 = math.radians(latitude), math.radians(longitude)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class _Segment:
+    """Column arrays of plots plus their addresses as one UTF-8 blob."""
+
+    def __init__(self, ids, latitudes, longitudes, sizes, ratings, labels, offsets):
+        self.ids = ids
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.sizes = sizes
+        self.ratings = ratings
+        self.labels = labels
+        self.offsets = offsets
+
+    @classmethod
+    def empty(cls):
+        return cls(
+            np.empty(0, np.int64), np.empty(0, np.float64), np.empty(0, np.float64),
+            np.empty(0, np.float32), np.empty((0, len(FRAGEN)), np.uint8),
+            np.empty(0, np.uint8), np.zeros(1, np.int64),
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def label(self, i):
+        return bytes(self.labels[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+
+class _Buffer:
+    """Preallocated columns for plots inserted since the last merge."""
+
+    def __init__(self, capacity):
+        self.count = 0
+        self.ids = np.empty(capacity, np.int64)
+        self.latitudes = np.empty(capacity, np.float64)
+        self.longitudes = np.empty(capacity, np.float64)
+        self.sizes = np.empty(capacity, np.float32)
+        self.ratings = np.empty((capacity, len(FRAGEN)), np.uint8)
+        self.addresses = []
+
+    def __len__(self):
+        return self.count
+
+    def append(self, plot_id, latitude, longitude, size, ratings, address):
+        i = self.count
+        self.ids[i] = plot_id
+        self.latitudes[i] = latitude
+        self.longitudes[i] = longitude
+        self.sizes[i] = size
+        self.ratings[i] = ratings
+        self.addresses.append(address)
+        self.count += 1
+
+    def label(self, i):
+        return self.addresses[i]
+
+    def to_segment(self):
+        n = self.count
+        encoded = [address.encode("utf-8") for address in self.addresses]
+        return _Segment(
+            self.ids[:n], self.latitudes[:n], self.longitudes[:n], self.sizes[:n], self.ratings[:n],
+            np.frombuffer(b"".join(encoded), np.uint8),
+            np.concatenate([[0], np.cumsum([len(e) for e in encoded], dtype=np.int64)]).astype(np.int64),
+        )
+
+
+class PlotIndex:
+    """
+    Grid index of plots with plot size, ratings and address attached.
+
+    `cell_degrees` is the edge length of a grid cell; it only affects
+    speed, never results.
+    """
+
+    def __init__(self, cell_degrees=0.01):
+        self.cell_degrees = cell_degrees
+        self.columns = math.ceil(360 / cell_degrees)
+        # Höchste übernommene Eingabe-ID aus dem SubmissionStore
+        self.last_id = 0
+        # Anzahl der Grundstücke mit ID 0, die noch auf ihre gespeicherte Eingabe warten
+        self._unassigned = 0
+        self._lock = threading.Lock()
+        self._sorted = _Segment.empty()
+        self._keys = np.empty(0, np.int64)
+        self._buffer = _Buffer(BUFFER_SIZE)
+
+    def __len__(self):
+        return len(self._sorted) + len(self._buffer)
+
+    def _cell(self, latitudes, longitudes):
+        rows = np.floor((np.asarray(latitudes) + 90) / self.cell_degrees).astype(np.int64)
+        columns = np.floor((np.asarray(longitudes) + 180) / self.cell_degrees).astype(np.int64) % self.columns
+        return rows * self.columns + columns
+
+    def insert(self, latitude, longitude, grundstuecks_groesse, bewertungen, adresse="", plot_id=0):
+        """
+        Add one plot; `bewertungen` are the ten ratings in question order.
+        A `plot_id` of 0 marks a plot that is not stored yet (see `assign_id`).
+        """
+        if len(bewertungen) != len(FRAGEN):
+            raise ValueError(f"Es werden {len(FRAGEN)} Bewertungen erwartet")
+        with self._lock:
+            self._buffer.append(plot_id, latitude, longitude, grundstuecks_groesse, bewertungen, adresse or "")
+            if not plot_id:
+                self._unassigned += 1
+            if len(self._buffer) >= BUFFER_SIZE:
+                self._merge()
+
+    def assign_id(self, latitude, longitude, adresse, plot_id):
+        """
+        Give a plot inserted with id 0 at this position and address the
+        stored `plot_id`. Returns False if there is no such plot.
+        """
+        if not self._unassigned:
+            return False
+        with self._lock:
+            buffer = self._buffer
+            n = buffer.count
+            matches = np.flatnonzero(
+                (buffer.ids[:n] == 0) & (buffer.latitudes[:n] == latitude) & (buffer.longitudes[:n] == longitude)
+            )
+            for i in matches:
+                if buffer.label(i) == adresse:
+                    buffer.ids[i] = plot_id
+                    self._unassigned -= 1
+                    return True
+
+            segment = self._sorted
+            key = int(self._cell(latitude, longitude))
+            start, stop = np.searchsorted(self._keys, [key, key + 1])
+            matches = start + np.flatnonzero(
+                (segment.ids[start:stop] == 0)
+                & (segment.latitudes[start:stop] == latitude)
+                & (segment.longitudes[start:stop] == longitude)
+            )
+            for i in matches:
+                if segment.label(i) == adresse:
+                    segment.ids[i] = plot_id
+                    self._unassigned -= 1
+                    return True
+        return False
+
+    def _merge(self):
+        """Merge the insert buffer into the sorted arrays (caller holds the lock)."""
+        new = self._buffer.to_segment()
+        old = self._sorted
+        keys = np.concatenate([self._keys, self._cell(new.latitudes, new.longitudes)])
+        order = np.argsort(keys, kind="stable")
+
+        lengths = np.concatenate([np.diff(old.offsets), np.diff(new.offsets)])[order]
+        starts = np.concatenate([old.offsets[:-1], new.offsets[:-1] + old.offsets[-1]])[order]
+        blob = np.concatenate([old.labels, new.labels])
+        offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        # Adressbytes in die neue Reihenfolge bringen
+        gather = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+
+        self._sorted = _Segment(
+            np.concatenate([old.ids, new.ids])[order],
+            np.concatenate([old.latitudes, new.latitudes])[order],
+            np.concatenate([old.longitudes, new.longitudes])[order],
+            np.concatenate([old.sizes, new.sizes])[order],
+            np.concatenate([old.ratings, new.ratings])[order],
+            blob[gather],
+            offsets,
+        )
+        self._keys = keys[order]
+        self._buffer = _Buffer(BUFFER_SIZE)
+
+    def _candidates(self, latitude, longitude, radius_km):
+        """Indices into the sorted arrays of all plots in cells touching the radius."""
+        if not len(self._keys):
+            return np.empty(0, np.int64)
+        delta_lat = radius_km / KM_PER_DEGREE
+        lat_low, lat_high = max(latitude - delta_lat, -90.0), min(latitude + delta_lat, 90.0)
+        max_cos = math.cos(math.radians(max(abs(lat_low), abs(lat_high))))
+        if lat_high >= 90 or lat_low <= -90 or max_cos * KM_PER_DEGREE * 180 <= radius_km:
+            column_ranges = [(0, self.columns - 1)]
+        else:
+            delta_lon = radius_km / (KM_PER_DEGREE * max_cos)
+            first = math.floor((longitude - delta_lon + 180) / self.cell_degrees)
+            last = math.floor((longitude + delta_lon + 180) / self.cell_degrees)
+            if first < 0:
+                column_ranges = [(0, last), (first % self.columns, self.columns - 1)]
+            elif last >= self.columns:
+                column_ranges = [(first, self.columns - 1), (0, last % self.columns)]
+            else:
+                column_ranges = [(first, last)]
+
+        rows = np.arange(
+            math.floor((lat_low + 90) / self.cell_degrees),
+            math.floor((lat_high + 90) / self.cell_degrees) + 1,
+            dtype=np.int64,
+        )
+        low = np.concatenate([rows * self.columns + first for first, _ in column_ranges])
+        high = np.concatenate([rows * self.columns + last + 1 for _, last in column_ranges])
+        starts = np.searchsorted(self._keys, low)
+        counts = np.searchsorted(self._keys, high) - starts
+        total = int(counts.sum())
+        if not total:
+            return np.empty(0, np.int64)
+        # Zusammenhängende Bereiche [start, start + count) ohne Python-Schleife aneinanderhängen
+        return np.repeat(starts - np.concatenate([[0], np.cumsum(counts)[:-1]]), counts) + np.arange(total)
+
+    def _within(self, latitude, longitude, radius_km):
+        """(segment, indices, distances) per segment for plots within `radius_km`."""
+        hits = []
+        candidates = self._candidates(latitude, longitude, radius_km)
+        for segment, indices in ((self._sorted, candidates), (self._buffer, np.arange(len(self._buffer)))):
+            if not len(indices):
+                continue
+            distances = haversine_km(latitude, longitude, segment.latitudes[indices], segment.longitudes[indices])
+            mask = distances <= radius_km
+            hits.append((segment, indices[mask], distances[mask]))
+        return hits
+
+    def _as_results(self, hits, limit=None):
+        rows = [(distance, segment, i) for segment, indices, distances in hits for i, distance in zip(indices, distances)]
+        rows.sort(key=lambda row: row[0])
+        return [
+            {
+                "id": int(segment.ids[i]),
+                "adresse": segment.label(i),
+                "latitude": float(segment.latitudes[i]),
+                "longitude": float(segment.longitudes[i]),
+                "grundstuecks_groesse": float(segment.sizes[i]),
+                "bewertungen": segment.ratings[i].tolist(),
+                "entfernung_km": float(distance),
+            }
+            for distance, segment, i in rows[:limit]
+        ]
+
+    def within_radius(self, latitude, longitude, radius_km, limit=None):
+        """Plots within `radius_km` of the point, nearest first."""
+        with self._lock:
+            return self._as_results(self._within(latitude, longitude, radius_km), limit)
+
+    def nearest(self, latitude, longitude, k=5, max_radius_km=None):
+        """
+        The `k` nearest plots, nearest first, optionally only within
+        `max_radius_km`. The search radius doubles until enough plots are found.
+        """
+        limit = max_radius_km if max_radius_km is not None else math.pi * EARTH_RADIUS_KM
+        radius = min(self.cell_degrees * KM_PER_DEGREE, limit)
+        with self._lock:
+            while True:
+                hits = self._within(latitude, longitude, radius)
+                if sum(len(indices) for _, indices, _ in hits) >= k or radius >= limit:
+                    return self._as_results(hits, k)
+                radius = min(radius * 2, limit)
+
+    def save(self, path):
+        """Write a snapshot of the index to `path` (.npz), atomically."""
+        with self._lock:
+            if len(self._buffer):
+                self._merge()
+            # Die übrigen Arrays ersetzt _merge nur, `ids` ändert assign_id an Ort und Stelle
+            segment, keys, ids = self._sorted, self._keys, self._sorted.ids.copy()
+            meta = np.array([self.cell_degrees, self.last_id], np.float64)
+        # Ohne Sperre schreiben, damit Anfragen währenddessen nicht warten
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f, keys=keys, ids=ids, latitudes=segment.latitudes,
+                longitudes=segment.longitudes, sizes=segment.sizes, ratings=segment.ratings,
+                labels=segment.labels, offsets=segment.offsets, meta=meta,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Load a snapshot written by `save`."""
+        with np.load(path, allow_pickle=False) as data:
+            cell_degrees, last_id = data["meta"]
+            index = cls(float(cell_degrees))
+            index.last_id = int(last_id)
+            index._keys = data["keys"]
+            index._sorted = _Segment(
+                data["ids"], data["latitudes"], data["longitudes"], data["sizes"],
+                data["ratings"], data["labels"], data["offsets"],
+            )
+            index._unassigned = int(np.count_nonzero(index._sorted.ids == 0))
+        return index
+
+    @classmethod
+    def from_settings(cls):
+        """The snapshot at `settings.PLOT_INDEX_PATH` if present, else an empty index."""
+        if os.path.exists(settings.PLOT_INDEX_PATH):
+            return cls.load(settings.PLOT_INDEX_PATH)
+        return cls(settings.PLOT_INDEX_CELL_DEGREES)
+
+
+def sync_from_store(index, store):
+    """
+    Insert all geocoded submissions of `store` newer than `index.last_id`.
+    Plots already inserted before they were stored only get their id.
+    Returns the number of inserted plots.
+    """
+    inserted = 0
+    for submission in store.query(after_id=index.last_id, columns=_STORE_COLUMNS):
+        latitude, longitude = submission["latitude"], submission["longitude"]
+        if latitude is not None and longitude is not None and not index.assign_id(
+            latitude, longitude, submission["adresse"], submission["id"]
+        ):
+            index.insert(
+                latitude,
+                longitude,
+                submission["grundstuecks_groesse"],
+                [submission[f"frage_{i}"] for i in range(1, len(FRAGEN) + 1)],
+                submission["adresse"],
+                submission["id"],
+            )
+            inserted += 1
+        index.last_id = submission["id"]
+    return inserted
+
+
+def update_snapshot(index, store, path):
+    """
+    Catch `index` up with `store` and save it to `path` if that took in
+    new submissions. Returns the number of inserted plots.
+    """
+    last_id = index.last_id
+    inserted = sync_from_store(index, store)
+    if index.last_id != last_id:
+        index.save(path)
+    return inserted
+
+
+def keep_snapshot(index, store, path, interval):
+    """
+    Update the snapshot now, every `interval` seconds in a daemon thread
+    (0 disables this) and at exit, after `store` has written its queue.
+    """
+
+    def update():
+        try:
+            update_snapshot(index, store, path)
+        except Exception:
+            logger.exception("Snapshot %s konnte nicht aktualisiert werden", path)
+
+    def run():
+        while True:
+            time.sleep(interval)
+            update()
+
+    def finish():
+        # Ausstehende Eingaben zuerst schreiben, damit sie im Snapshot landen
+        store.close()
+        update()
+
+    update()
+    if interval > 0:
+        threading.Thread(target=run, name="plot-index-snapshot", daemon=True).start()
+    atexit.register(finish)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Räumlicher Index gespeicherter Grundstücke")
+    parser.add_argument("--snapshot", default=settings.PLOT_INDEX_PATH, help="Snapshot-Datei (.npz)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("build", help="Snapshot aus den gespeicherten Eingaben erstellen/aktualisieren")
+
+    leads = subparsers.add_parser("leads", help="Grundstücke im Umkreis als CSV ausgeben")
+    position = leads.add_mutually_exclusive_group(required=True)
+    position.add_argument("--adresse", help="Mittelpunkt als Adresse (wird geocodiert)")
+    position.add_argument("--position", nargs=2, type=float, metavar=("LAT", "LON"))
+    leads.add_argument("--radius-km", type=float, default=10.0)
+    leads.add_argument("--limit", type=int, help="Höchstens so viele Grundstücke ausgeben")
+
+    args = parser.parse_args(argv)
+
+    from submission_store import SubmissionStore
+
+    if os.path.exists(args.snapshot):
+        index = PlotIndex.load(args.snapshot)
+    else:
+        index = PlotIndex(settings.PLOT_INDEX_CELL_DEGREES)
+    store = SubmissionStore.from_settings()
+    inserted = sync_from_store(index, store)
+
+    if args.command == "build":
+        index.save(args.snapshot)
+        print(f"{len(index)} Grundstücke ({inserted} neu) in {args.snapshot} geschrieben", file=sys.stderr)
+        return 0
+
+    if args.adresse:
+        from geocoding import build_geocoder
+
+        location = build_geocoder().geocode(args.adresse)
+        if not location["found"]:
+            print(f"Adresse nicht gefunden: {location.get('error', args.adresse)}", file=sys.stderr)
+            return 1
+        latitude, longitude = location["latitude"], location["longitude"]
+    else:
+        latitude, longitude = args.position
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["id", "entfernung_km", "adresse", "grundstuecks_groesse", "latitude", "longitude"]
+                    + [f"frage_{i}" for i in range(1, len(FRAGEN) + 1)])
+    for plot in index.within_radius(latitude, longitude, args.radius_km, args.limit):
+        writer.writerow([plot["id"], f"{plot['entfernung_km']:.2f}", plot["adresse"], plot["grundstuecks_groesse"],
+                         plot["latitude"], plot["longitude"]] + plot["bewertungen"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
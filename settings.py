@@ -0,0 +1,106 @@
+"""
+Runtime configuration for the house planner.
+
+All settings can be overridden through environment variables so that
+several Streamlit replicas can share the same cache files and limits.
+"""
+
+import os
+
+
+def _env_str(name, default):
+    return os.environ.get(name, default)
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_float(name, default):
+    value = os.environ.get(name)
+    return float(value) if value not in (None, "") else default
+
+
+# Verzeichnis für alle lokalen Caches und Datenbanken
+DATA_DIR = _env_str("HOUSE_PLANNER_DATA_DIR", ".house_planner")
+
+# Geocoding-Cache (SQLite, von allen Prozessen gemeinsam genutzt)
+GEOCODE_CACHE_PATH = _env_str(
+    "HOUSE_PLANNER_GEOCODE_CACHE", os.path.join(DATA_DIR, "geocode_cache.sqlite3")
+)
+GEOCODE_CACHE_TTL = _env_int("HOUSE_PLANNER_GEOCODE_CACHE_TTL", 30 * 24 * 3600)
+GEOCODE_CACHE_NOT_FOUND_TTL = _env_int("HOUSE_PLANNER_GEOCODE_CACHE_NOT_FOUND_TTL", 3600)
+GEOCODE_CACHE_ERROR_TTL = _env_int("HOUSE_PLANNER_GEOCODE_CACHE_ERROR_TTL", 60)
+GEOCODE_CACHE_MAX_ENTRIES = _env_int("HOUSE_PLANNER_GEOCODE_CACHE_MAX_ENTRIES", 100_000)
+GEOCODE_WORKERS = _env_int("HOUSE_PLANNER_GEOCODE_WORKERS", 4)
+
+# Nominatim-Anbindung
+NOMINATIM_URL = _env_str("HOUSE_PLANNER_NOMINATIM_URL", "https://nominatim.openstreetmap.org")
+NOMINATIM_USER_AGENT = _env_str("HOUSE_PLANNER_NOMINATIM_USER_AGENT", "house_planner_v1.0")
+NOMINATIM_TIMEOUT = _env_float("HOUSE_PLANNER_NOMINATIM_TIMEOUT", 10.0)
+NOMINATIM_RATE = _env_float("HOUSE_PLANNER_NOMINATIM_RATE", 1.0)
+NOMINATIM_MAX_PENDING = _env_int("HOUSE_PLANNER_NOMINATIM_MAX_PENDING", 20)
+NOMINATIM_MAX_RETRIES = _env_int("HOUSE_PLANNER_NOMINATIM_MAX_RETRIES", 3)
+# Längste Wartezeit vor einer Wiederholung; längere Retry-After-Angaben lassen die Anfrage fehlschlagen
+NOMINATIM_MAX_RETRY_DELAY = _env_float("HOUSE_PLANNER_NOMINATIM_MAX_RETRY_DELAY", 5.0)
+
+# Offline-Adressindex (leer = deaktiviert, siehe address_index.py)
+ADDRESS_INDEX_PATH = _env_str("HOUSE_PLANNER_ADDRESS_INDEX", "")
+
+# Kachel-Proxy (siehe tile_proxy.py); Port 0 = kein eingebetteter Proxy
+TILE_UPSTREAM_URL = _env_str("HOUSE_PLANNER_TILE_UPSTREAM_URL", "https://tile.openstreetmap.org/{z}/{x}/{y}.png")
+TILE_CACHE_DIR = _env_str("HOUSE_PLANNER_TILE_CACHE_DIR", os.path.join(DATA_DIR, "tiles"))
+TILE_CACHE_MAX_BYTES = _env_int("HOUSE_PLANNER_TILE_CACHE_MAX_BYTES", 500 * 1024 * 1024)
+TILE_CACHE_MAX_AGE = _env_int("HOUSE_PLANNER_TILE_CACHE_MAX_AGE", 7 * 24 * 3600)
+TILE_PROXY_HOST = _env_str("HOUSE_PLANNER_TILE_PROXY_HOST", "127.0.0.1")
+TILE_PROXY_PORT = _env_int("HOUSE_PLANNER_TILE_PROXY_PORT", 0)
+
+# Karte; die Kachel-URL lädt der Browser des Nutzers, daher wird der eingebettete Proxy nur
+# automatisch verwendet, wenn TILE_PROXY_HOST von außen erreichbar ist (kein Loopback/Wildcard)
+_TILE_PROXY_REACHABLE = TILE_PROXY_PORT and TILE_PROXY_HOST not in ("127.0.0.1", "localhost", "::1", "0.0.0.0", "::", "")
+TILE_URL = _env_str(
+    "HOUSE_PLANNER_TILE_URL",
+    f"http://{TILE_PROXY_HOST}:{TILE_PROXY_PORT}/{{z}}/{{x}}/{{y}}.png" if _TILE_PROXY_REACHABLE else TILE_UPSTREAM_URL
+)
+# "static" zeigt standardmäßig ein einzelnes PNG statt der interaktiven Leaflet-Karte
+MAP_INTERACTIVE = _env_str("HOUSE_PLANNER_MAP_MODE", "interactive") != "static"
+
+# Katalog der Hausentwürfe (leer = keine Empfehlungen, siehe matching.py)
+DESIGN_CATALOG_PATH = _env_str("HOUSE_PLANNER_DESIGN_CATALOG", "")
+# Anteil des Grundstücks, der überbaut werden darf (Grundflächenzahl)
+SITE_COVERAGE = _env_float("HOUSE_PLANNER_SITE_COVERAGE", 0.4)
+
+# Besonnungsanalyse (siehe solar.py)
+SOLAR_TIMEZONE = _env_str("HOUSE_PLANNER_SOLAR_TIMEZONE", "Europe/Berlin")
+# Kantenlänge der Rasterzellen, für die das Ergebnis wiederverwendet wird (Grad)
+SOLAR_GRID_DEGREES = _env_float("HOUSE_PLANNER_SOLAR_GRID_DEGREES", 0.1)
+
+# Speicherung bestätigter Eingaben (siehe submission_store.py)
+SUBMISSION_DB_PATH = _env_str(
+    "HOUSE_PLANNER_SUBMISSION_DB", os.path.join(DATA_DIR, "submissions.sqlite3")
+)
+SUBMISSION_QUEUE_SIZE = _env_int("HOUSE_PLANNER_SUBMISSION_QUEUE_SIZE", 10_000)
+SUBMISSION_BATCH_SIZE = _env_int("HOUSE_PLANNER_SUBMISSION_BATCH_SIZE", 100)
+SUBMISSION_FLUSH_INTERVAL = _env_float("HOUSE_PLANNER_SUBMISSION_FLUSH_INTERVAL", 1.0)
+
+# Laufzeitmessung (siehe instrumentation.py); Port 0 = kein Metrik-Endpunkt
+METRICS_HOST = _env_str("HOUSE_PLANNER_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = _env_int("HOUSE_PLANNER_METRICS_PORT", 0)
+# Zeigt die Laufzeiten des aktuellen Durchlaufs in der Seitenleiste
+DEBUG_PANEL = _env_int("HOUSE_PLANNER_DEBUG_PANEL", 0) == 1
+# Sitzungen ohne Aktivität in diesem Zeitraum gelten nicht mehr als aktiv (Sekunden)
+METRICS_SESSION_TIMEOUT = _env_int("HOUSE_PLANNER_METRICS_SESSION_TIMEOUT", 300)
+
+# Generierte 3D-Massenmodelle (siehe massing_model.py)
+MODEL_CACHE_DIR = _env_str("HOUSE_PLANNER_MODEL_CACHE_DIR", os.path.join(DATA_DIR, "models"))
+MODEL_CACHE_MAX_BYTES = _env_int("HOUSE_PLANNER_MODEL_CACHE_MAX_BYTES", 50 * 1024 * 1024)
+
+# Räumlicher Index gespeicherter Grundstücke (siehe plot_index.py)
+PLOT_INDEX_PATH = _env_str("HOUSE_PLANNER_PLOT_INDEX", os.path.join(DATA_DIR, "plot_index.npz"))
+# Kantenlänge der Rasterzellen (Grad); beeinflusst nur die Geschwindigkeit
+PLOT_INDEX_CELL_DEGREES = _env_float("HOUSE_PLANNER_PLOT_INDEX_CELL_DEGREES", 0.01)
+# Abstand, in dem die App den Index abgleicht und den Snapshot neu schreibt (Sekunden, 0 = nur beim Start und Beenden)
+PLOT_INDEX_SAVE_INTERVAL = _env_int("HOUSE_PLANNER_PLOT_INDEX_SAVE_INTERVAL", 600)
+# Umkreis für vergleichbare Grundstücke in der Zusammenfassung (km)
+COMPARABLE_PLOTS_RADIUS_KM = _env_float("HOUSE_PLANNER_COMPARABLE_PLOTS_RADIUS_KM", 5.0)
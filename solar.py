@@ -0,0 +1,148 @@
+"""
+Solar exposure of a plot for the breakfast-sunshine and daylight questions.
+
+Sun azimuth and elevation are computed with the NOAA approximation for
+every 15-minute step of a reference year, fully vectorized with NumPy.
+From that, the hours of direct sun per facade orientation are derived,
+both in total and within the breakfast window (local clock time).
+Results are cached per grid cell of rounded coordinates, so nearby
+plots reuse the same computation.
+"""
+
+import datetime
+import functools
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+import settings
+
+# Referenzjahr (kein Schaltjahr) für reproduzierbare Ergebnisse
+REFERENCE_YEAR = 2023
+STEP_MINUTES = 15
+
+# Fassadenausrichtungen: Name -> Azimut der Fassadennormalen (Grad, Nord = 0, im Uhrzeigersinn)
+FACADES = {
+    "Nord": 0,
+    "Nordost": 45,
+    "Ost": 90,
+    "Südost": 135,
+    "Süd": 180,
+    "Südwest": 225,
+    "West": 270,
+    "Nordwest": 315,
+}
+
+# Frühstückszeit (Ortszeit, Stunden)
+BREAKFAST_START = 6
+BREAKFAST_END = 10
+
+
+def _utc_offsets_hours(year, timezone, steps_per_day):
+    """UTC offset in hours for every time step (resolved per day)."""
+    zone = ZoneInfo(timezone)
+    start = datetime.datetime(year, 1, 1, 12)
+    days = (datetime.datetime(year + 1, 1, 1) - datetime.datetime(year, 1, 1)).days
+    offsets = np.array([
+        (start + datetime.timedelta(days=d)).replace(tzinfo=zone).utcoffset().total_seconds() / 3600
+        for d in range(days)
+    ])
+    return np.repeat(offsets, steps_per_day)
+
+
+def sun_positions(latitude, longitude, year=REFERENCE_YEAR, step_minutes=STEP_MINUTES):
+    """
+    Return (minutes since start of year in UTC, azimuth, elevation) in degrees
+    for every time step of `year`.
+    """
+    days = (datetime.date(year + 1, 1, 1) - datetime.date(year, 1, 1)).days
+    minutes = np.arange(0, days * 24 * 60, step_minutes, dtype=np.float64)
+    day_of_year = minutes // (24 * 60) + 1
+    minute_of_day = minutes % (24 * 60)
+
+    # NOAA: Zeitgleichung und Deklination aus dem Jahreswinkel
+    gamma = 2 * np.pi / days * (day_of_year - 1 + (minute_of_day / 60 - 12) / 24)
+    equation_of_time = 229.18 * (
+        0.000075 + 0.001868 * np.cos(gamma) - 0.032077 * np.sin(gamma)
+        - 0.014615 * np.cos(2 * gamma) - 0.040849 * np.sin(2 * gamma)
+    )
+    declination = (
+        0.006918 - 0.399912 * np.cos(gamma) + 0.070257 * np.sin(gamma)
+        - 0.006758 * np.cos(2 * gamma) + 0.000907 * np.sin(2 * gamma)
+        - 0.002697 * np.cos(3 * gamma) + 0.00148 * np.sin(3 * gamma)
+    )
+
+    true_solar_time = minute_of_day + equation_of_time + 4 * longitude
+    hour_angle = np.radians(true_solar_time / 4 - 180)
+    lat = np.radians(latitude)
+
+    cos_zenith = np.sin(lat) * np.sin(declination) + np.cos(lat) * np.cos(declination) * np.cos(hour_angle)
+    elevation = 90 - np.degrees(np.arccos(np.clip(cos_zenith, -1, 1)))
+    azimuth = (np.degrees(np.arctan2(
+        np.sin(hour_angle),
+        np.cos(hour_angle) * np.sin(lat) - np.tan(declination) * np.cos(lat)
+    )) + 180) % 360
+    return minutes, azimuth, elevation
+
+
+def facade_sun_hours(latitude, longitude, timezone=None, year=REFERENCE_YEAR, step_minutes=STEP_MINUTES):
+    """
+    Average hours of direct sun per day on each facade orientation.
+
+    Returns {facade: {"morgen": hours in the breakfast window, "gesamt":
+    hours over the whole day}}. A facade counts as sunlit while the sun is
+    above the horizon and within 90° of the facade normal.
+    """
+    timezone = timezone or settings.SOLAR_TIMEZONE
+    minutes, azimuth, elevation = sun_positions(latitude, longitude, year, step_minutes)
+    steps_per_day = 24 * 60 // step_minutes
+    days = len(minutes) // steps_per_day
+
+    local_hour = (minutes % (24 * 60) / 60 + _utc_offsets_hours(year, timezone, steps_per_day)) % 24
+    breakfast = (local_hour >= BREAKFAST_START) & (local_hour < BREAKFAST_END)
+
+    facade_azimuths = np.radians(np.array(list(FACADES.values()), dtype=np.float64))
+    # (Fassaden, Zeitschritte): Sonne über dem Horizont und vor der Fassade
+    sunlit = (np.cos(np.radians(azimuth)[np.newaxis, :] - facade_azimuths[:, np.newaxis]) > 0) & (elevation > 0)
+
+    step_hours = step_minutes / 60
+    total = sunlit.sum(axis=1) * step_hours / days
+    morning = (sunlit & breakfast).sum(axis=1) * step_hours / days
+    return {
+        name: {"morgen": float(m), "gesamt": float(t)}
+        for name, m, t in zip(FACADES, morning, total)
+    }
+
+
+@functools.lru_cache(maxsize=1024)
+def _cached_facade_sun_hours(cell_latitude, cell_longitude):
+    return facade_sun_hours(cell_latitude, cell_longitude)
+
+
+def solar_analysis(latitude, longitude, bewertung_fruehstueck=3, bewertung_licht=3):
+    """
+    Facade sun hours for a plot plus the recommended orientation of the
+    main living area.
+
+    The computation is cached for the grid cell containing the plot
+    (`settings.SOLAR_GRID_DEGREES`). The recommendation weights breakfast
+    sun and all-day sun by the ratings of question 1 and question 6.
+    """
+    cell = settings.SOLAR_GRID_DEGREES
+    fassaden = _cached_facade_sun_hours(
+        round(round(latitude / cell) * cell, 6),
+        round(round(longitude / cell) * cell, 6)
+    )
+
+    max_morgen = max(f["morgen"] for f in fassaden.values()) or 1.0
+    max_gesamt = max(f["gesamt"] for f in fassaden.values()) or 1.0
+
+    def punkte(name):
+        f = fassaden[name]
+        return bewertung_fruehstueck * f["morgen"] / max_morgen + bewertung_licht * f["gesamt"] / max_gesamt
+
+    return {
+        "fassaden": fassaden,
+        "fruehstueck_ausrichtung": max(fassaden, key=lambda name: fassaden[name]["morgen"]),
+        "empfohlene_ausrichtung": max(fassaden, key=punkte),
+    }
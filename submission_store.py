@@ -0,0 +1,243 @@
+"""
+Append-only store for confirmed planning sessions.
+
+`submit` only puts the submission on a bounded in-memory queue; a
+background thread writes queued submissions in batches to a SQLite
+database in WAL mode. When the queue is full, new submissions are
+dropped and counted instead of blocking the UI. A batch that cannot be
+written (database locked, disk full) is retried a few times and then
+logged and counted as failed, so the writer keeps running. Pending
+submissions are flushed on interpreter shutdown.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import settings
+from planner_core import FRAGEN
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+_COLUMNS = (
+    ["created_at", "grundstuecks_groesse", "adresse", "latitude", "longitude"]
+    + [f"frage_{i}" for i in range(1, len(FRAGEN) + 1)]
+    + ["ergebnis"]
+)
+
+
+class SubmissionStore:
+    """
+    Write-behind SQLite store of submissions (results of `planner_core.build_result`).
+    """
+
+    def __init__(self, path, max_queue=10_000, batch_size=100, flush_interval=1.0,
+                 max_retries=3, retry_delay=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        frage_columns = "".join(f"frage_{i} INTEGER NOT NULL, " for i in range(1, len(FRAGEN) + 1))
+        with self._connect() as conn:
+            conn.executescript(
+                f"""
+                CREATE TABLE IF NOT EXISTS submissions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at REAL NOT NULL,
+                    grundstuecks_groesse REAL NOT NULL,
+                    adresse TEXT NOT NULL,
+                    latitude REAL,
+                    longitude REAL,
+                    {frage_columns}
+                    ergebnis TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS submissions_created_at ON submissions (created_at);
+                """
+            )
+
+        self._writer = threading.Thread(target=self._run, name="submission-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            settings.SUBMISSION_DB_PATH,
+            max_queue=settings.SUBMISSION_QUEUE_SIZE,
+            batch_size=settings.SUBMISSION_BATCH_SIZE,
+            flush_interval=settings.SUBMISSION_FLUSH_INTERVAL,
+        )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def submit(self, result):
+        """
+        Enqueue a submission without blocking. Returns False if it was
+        dropped because the queue is full.
+        """
+        standort = result.get("standort") or {}
+        row = (
+            [
+                time.time(),
+                result["grundstuecks_groesse"],
+                result["adresse"],
+                standort.get("latitude"),
+                standort.get("longitude"),
+            ]
+            + [result["bewertungen"][f"frage_{i}"] for i in range(1, len(FRAGEN) + 1)]
+            + [json.dumps(result, ensure_ascii=False)]
+        )
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def _write(self, conn, batch):
+        """
+        Insert `batch`, retrying with a fresh connection on errors. Returns
+        the connection to use next, or None if the last attempt failed.
+        """
+        insert = f"INSERT INTO submissions ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})"
+        for attempt in range(self.max_retries + 1):
+            try:
+                if conn is None:
+                    conn = self._connect()
+                with conn:
+                    conn.executemany(insert, batch)
+                self.written += len(batch)
+                return conn
+            except Exception:
+                logger.exception(
+                    "Schreiben von %d Eingaben fehlgeschlagen (Versuch %d von %d)",
+                    len(batch), attempt + 1, self.max_retries + 1,
+                )
+                if conn is not None:
+                    conn.close()
+                    conn = None
+                if attempt < self.max_retries:
+                    time.sleep(self.retry_delay * 2 ** attempt)
+        self.failed += len(batch)
+        return None
+
+    def _run(self):
+        conn = None
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            # Bis zur Batchgröße oder zum Ablauf des Intervalls sammeln
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0.001) if batch else None)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+            if batch:
+                try:
+                    conn = self._write(conn, batch)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+        if conn is not None:
+            conn.close()
+
+    def flush(self):
+        """
+        Block until every submission enqueued so far is written (or has
+        failed). Raises RuntimeError if the writer thread is not running.
+        """
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                if not self._writer.is_alive():
+                    raise RuntimeError("Schreib-Thread des SubmissionStore läuft nicht mehr")
+                self._queue.all_tasks_done.wait(timeout=0.5)
+
+    def close(self):
+        """Write all pending submissions and stop the writer thread."""
+        if not self._writer.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._writer.join()
+
+    def query(self, since=None, until=None, limit=None, chunk_size=1000, after_id=None, columns=None):
+        """
+        Yield stored submissions as dicts, oldest first, reading in chunks.
+
+        `since` and `until` are Unix timestamps bounding `created_at`;
+        `after_id` skips submissions up to and including that id.
+        `columns` restricts the dicts to `id` plus these columns; `ergebnis`
+        is only read and parsed when selected.
+        """
+        if columns is None:
+            columns = _COLUMNS
+        unknown = set(columns) - set(_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unbekannte Spalten: {', '.join(sorted(unknown))}")
+        conditions, params = [], []
+        if after_id is not None:
+            conditions.append("id > ?")
+            params.append(after_id)
+        if since is not None:
+            conditions.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("created_at < ?")
+            params.append(until)
+        sql = "SELECT " + ", ".join(["id", *columns]) + " FROM submissions"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        parse_ergebnis = "ergebnis" in columns
+        conn = self._connect()
+        try:
+            cursor = conn.execute(sql, params)
+            names = [description[0] for description in cursor.description]
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    submission = dict(zip(names, row))
+                    if parse_ergebnis:
+                        submission["ergebnis"] = json.loads(submission["ergebnis"])
+                    yield submission
+        finally:
+            conn.close()
+
+    def count(self):
+        conn = self._connect()
+        try:
+            (count,) = conn.execute("SELECT COUNT(*) FROM submissions").fetchone()
+        finally:
+            conn.close()
+        return count
@@ -0,0 +1,120 @@
+import json
+import threading
+import time
+
+import pytest
+import requests
+
+from geocode_cache import GeocodeCache
+from geocoding import Geocoder, GeocodingBusy, GeocodingService, NominatimClient
+
+PLACE = [{"lat": "52.5", "lon": "13.4", "display_name": "Musterstraße 1, 12345 Musterstadt"}]
+
+
+def nominatim(statuses=(), delay=0.0, retry_after=None):
+    """Fake Nominatim: answers with `statuses` in turn, then 200 with PLACE."""
+    remaining = list(statuses)
+
+    def respond(path, headers):
+        time.sleep(delay)
+        status = remaining.pop(0) if remaining else 200
+        if status != 200:
+            return status, {"Retry-After": retry_after} if retry_after else {}, b"[]"
+        return 200, {"Content-Type": "application/json"}, json.dumps(PLACE).encode()
+
+    return respond
+
+
+def make_client(server, **kwargs):
+    kwargs.setdefault("rate", 100.0)
+    kwargs.setdefault("backoff", 0.01)
+    return NominatimClient(server.url, "house_planner_tests", timeout=5, **kwargs)
+
+
+def make_service(tmp_path, client):
+    cache = GeocodeCache(str(tmp_path / "geocode.sqlite3"), ttl=3600, not_found_ttl=60,
+                         error_ttl=60, max_entries=1000)
+    return GeocodingService(cache, client)
+
+
+def test_geocoder_is_abstract():
+    with pytest.raises(TypeError):
+        Geocoder()
+
+
+def test_concurrent_lookups_of_one_address_share_a_request(stub_server, tmp_path):
+    server = stub_server(nominatim(delay=0.3))
+    service = make_service(tmp_path, make_client(server))
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(service.geocode("Musterstraße 1, 12345 Musterstadt")))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(server.requests) == 1
+    assert len(results) == 5
+    assert all(result["found"] and result["latitude"] == 52.5 for result in results)
+
+
+def test_requests_are_spaced_by_the_rate_limit(stub_server):
+    server = stub_server(nominatim())
+    client = make_client(server, rate=1.0)
+
+    for i in range(3):
+        client.search(f"Musterstraße {i}")
+
+    times = [t for t, _, _ in server.requests]
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    assert len(times) == 3
+    assert all(gap >= 0.9 for gap in gaps)
+
+
+def test_429_and_5xx_are_retried_with_backoff(stub_server):
+    server = stub_server(nominatim(statuses=[429, 503]))
+    client = make_client(server, max_retries=3)
+
+    assert client.search("Musterstraße 1")["found"]
+    assert len(server.requests) == 3
+
+
+def test_retry_after_is_honoured(stub_server):
+    server = stub_server(nominatim(statuses=[429], retry_after="1"))
+    client = make_client(server, max_retries=3)
+
+    started = time.monotonic()
+    assert client.search("Musterstraße 1")["found"]
+    assert time.monotonic() - started >= 1.0
+    assert len(server.requests) == 2
+
+
+def test_long_retry_after_fails_instead_of_waiting(stub_server, tmp_path):
+    server = stub_server(nominatim(statuses=[429], retry_after="3600"))
+    client = make_client(server, max_retries=3, max_retry_delay=2.0)
+
+    started = time.monotonic()
+    with pytest.raises(requests.HTTPError):
+        client.search("Musterstraße 1")
+    assert time.monotonic() - started < 2.0
+    assert len(server.requests) == 1
+
+
+def test_full_queue_raises_busy_and_is_not_cached(stub_server, tmp_path):
+    server = stub_server(nominatim(delay=0.5))
+    client = make_client(server, max_pending=1)
+    service = make_service(tmp_path, client)
+
+    first = threading.Thread(target=client.search, args=("Musterstraße 1",))
+    first.start()
+    time.sleep(0.1)
+    with pytest.raises(GeocodingBusy):
+        client.search("Musterstraße 2")
+
+    result = service.geocode("Musterstraße 2")
+    first.join()
+    assert not result["found"] and "error" in result
+    assert service.cache.get("Musterstraße 2") is None
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from plot_index import PlotIndex, sync_from_store, update_snapshot
+from submission_store import SubmissionStore
+
+BEWERTUNGEN = [3] * 10
+
+
+def submission(adresse, latitude, longitude):
+    return {
+        "grundstuecks_groesse": 600,
+        "adresse": adresse,
+        "standort": {"found": True, "latitude": latitude, "longitude": longitude},
+        "bewertungen": {f"frage_{i}": 3 for i in range(1, 11)},
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SubmissionStore(str(tmp_path / "eingaben.db"), flush_interval=0.05)
+    yield store
+    store.close()
+
+
+def test_query_with_columns_skips_ergebnis(store):
+    store.submit(submission("Musterstraße 1, 12345 Musterstadt", 52.52, 13.405))
+    store.flush()
+
+    (row,) = store.query(columns=["adresse", "latitude"])
+    assert row == {"id": 1, "adresse": "Musterstraße 1, 12345 Musterstadt", "latitude": 52.52}
+    with pytest.raises(ValueError):
+        list(store.query(columns=["ergebnis; DROP TABLE submissions"]))
+
+
+def test_sync_assigns_ids_to_plots_inserted_before_storing(store):
+    index = PlotIndex()
+    index.insert(52.52, 13.405, 600, BEWERTUNGEN, "Musterstraße 1, 12345 Musterstadt")
+    store.submit(submission("Musterstraße 1, 12345 Musterstadt", 52.52, 13.405))
+    store.submit(submission("Beispielweg 2, 12345 Musterstadt", 52.53, 13.41))
+    store.flush()
+
+    assert sync_from_store(index, store) == 1
+    assert len(index) == 2
+    assert sorted(plot["id"] for plot in index.nearest(52.52, 13.405, k=5)) == [1, 2]
+    assert index.last_id == 2
+
+
+def test_snapshot_is_written_only_when_the_store_has_news(store, tmp_path):
+    path = str(tmp_path / "plot_index.npz")
+    index = PlotIndex()
+    update_snapshot(index, store, path)
+    assert not (tmp_path / "plot_index.npz").exists()
+
+    store.submit(submission("Musterstraße 1, 12345 Musterstadt", 52.52, 13.405))
+    store.flush()
+    assert update_snapshot(index, store, path) == 1
+
+    loaded = PlotIndex.load(path)
+    assert loaded.last_id == 1
+    (plot,) = loaded.within_radius(52.52, 13.405, 1.0)
+    assert plot["id"] == 1 and plot["adresse"] == "Musterstraße 1, 12345 Musterstadt"
+    assert sync_from_store(loaded, store) == 0
+    np.testing.assert_array_equal(loaded._sorted.ids, [1])
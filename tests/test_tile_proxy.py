@@ -0,0 +1,135 @@
+import os
+import time
+
+import pytest
+import requests
+
+from disk_cache import DiskLRUCache
+from tile_proxy import TileCache, start_tile_proxy
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"kachel" * 100
+
+
+def tile_server(etag='"v1"'):
+    """Stand-in tile server: answers 304 when the client already has `etag`."""
+
+    def respond(path, headers):
+        if headers.get("If-None-Match") == etag:
+            return 304, {"ETag": etag}, b""
+        return 200, {"Content-Type": "image/png", "ETag": etag}, PNG
+
+    return respond
+
+
+def make_tiles(server, tmp_path, max_bytes=10_000_000, max_age=3600):
+    return TileCache(
+        DiskLRUCache(str(tmp_path / "tiles"), max_bytes),
+        upstream_url=server.url + "/{z}/{x}/{y}.png",
+        user_agent="house_planner_tests",
+        max_age=max_age,
+        timeout=2,
+    )
+
+
+def make_stale(tiles, key):
+    _, metadata = tiles.cache.get(key)
+    metadata["fetched_at"] = 0
+    tiles.cache.update_metadata(key, metadata)
+
+
+def test_cache_hit_makes_no_upstream_request(stub_server, tmp_path):
+    server = stub_server(tile_server())
+    tiles = make_tiles(server, tmp_path)
+
+    assert tiles.get_tile(15, 17602, 10746) == PNG
+    assert tiles.get_tile(15, 17602, 10746) == PNG
+    assert len(server.requests) == 1
+
+
+def test_stale_tile_is_revalidated_and_refreshed_by_304(stub_server, tmp_path):
+    server = stub_server(tile_server())
+    tiles = make_tiles(server, tmp_path)
+    tiles.get_tile(15, 17602, 10746)
+    make_stale(tiles, "15/17602/10746")
+
+    assert tiles.get_tile(15, 17602, 10746) == PNG
+    assert server.requests[-1][2].get("If-None-Match") == '"v1"'
+    assert tiles.is_fresh(15, 17602, 10746)
+
+    tiles.get_tile(15, 17602, 10746)
+    assert len(server.requests) == 2
+
+
+def test_stale_tile_is_served_when_upstream_is_down(stub_server, tmp_path):
+    server = stub_server(tile_server())
+    tiles = make_tiles(server, tmp_path)
+    tiles.get_tile(15, 17602, 10746)
+    make_stale(tiles, "15/17602/10746")
+    server.close()
+
+    assert tiles.get_tile(15, 17602, 10746) == PNG
+    with pytest.raises(requests.RequestException):
+        tiles.get_tile(15, 17603, 10746)
+
+
+def test_lru_eviction_keeps_cache_under_max_bytes(tmp_path):
+    cache = DiskLRUCache(str(tmp_path / "lru"), max_bytes=10_000)
+    for i in range(5):
+        cache.put(f"kachel/{i}", b"x" * 1000)
+    # Der älteste Eintrag wurde zuletzt benutzt und darf nicht verdrängt werden
+    time.sleep(0.01)
+    os.utime(cache._paths("kachel/0")[0], (time.time() + 60, time.time() + 60))
+    for i in range(5, 30):
+        cache.put(f"kachel/{i}", b"x" * 1000)
+
+    on_disk = sum(size for _, size, _ in cache._entries())
+    assert on_disk <= 10_000
+    assert cache.size == on_disk
+    assert cache.get("kachel/0") is not None
+    assert cache.get("kachel/1") is None
+    assert cache.get("kachel/29") is not None
+
+
+def test_prefetch_skips_fresh_tiles(stub_server, tmp_path):
+    server = stub_server(tile_server())
+    tiles = make_tiles(server, tmp_path)
+
+    fetched = tiles.prefetch(52.52, 13.405, zooms=[15])
+    assert fetched == len(server.requests) > 0
+    assert tiles.prefetch(52.52, 13.405, zooms=[15]) == 0
+    assert len(server.requests) == fetched
+
+
+def test_tile_is_served_when_it_cannot_be_stored(stub_server, tmp_path, monkeypatch):
+    server = stub_server(tile_server())
+    tiles = make_tiles(server, tmp_path)
+
+    def disk_full(*args, **kwargs):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(tiles.cache, "put", disk_full)
+    proxy = start_tile_proxy(tiles)
+    try:
+        response = requests.get(f"http://127.0.0.1:{proxy.server_port}/15/17602/10746.png", timeout=5)
+    finally:
+        proxy.shutdown()
+        proxy.server_close()
+    assert response.status_code == 200
+    assert response.content == PNG
+
+
+def test_proxy_answers_500_on_unexpected_errors(stub_server, tmp_path, monkeypatch):
+    server = stub_server(tile_server())
+    tiles = make_tiles(server, tmp_path)
+
+    def broken(*args):
+        raise ValueError("kaputt")
+
+    monkeypatch.setattr(tiles, "get_tile", broken)
+    proxy = start_tile_proxy(tiles)
+    try:
+        response = requests.get(f"http://127.0.0.1:{proxy.server_port}/15/17602/10746.png", timeout=5)
+    finally:
+        proxy.shutdown()
+        proxy.server_close()
+    assert response.status_code == 500
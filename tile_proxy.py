@@ -0,0 +1,226 @@
+"""
+Local caching proxy for OpenStreetMap tiles.
+
+The proxy serves `/{z}/{x}/{y}.png` from a size-bounded disk cache and
+only contacts the upstream tile server for missing tiles or to
+revalidate stale ones (If-None-Match / If-Modified-Since). When the
+upstream is unreachable, stale tiles are still served. Tiles around a
+geocoded plot can be prefetched for the zoom levels the app uses.
+
+Run standalone and point the app at it:
+
+    python tile_proxy.py serve --host 0.0.0.0 --port 8765
+    export HOUSE_PLANNER_TILE_URL="http://tiles.example.org:8765/{z}/{x}/{y}.png"
+
+The URL is loaded by the user's browser, so it must name a host the
+users can reach, not localhost.
+
+Prefetch tiles around a plot:
+
+    python tile_proxy.py prefetch 52.5200 13.4050
+"""
+
+import argparse
+import logging
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+import settings
+from disk_cache import DiskLRUCache
+from instrumentation import external_call
+from map_rendering import TILE_SIZE, tile_position
+
+logger = logging.getLogger(__name__)
+
+_TILE_PATH = re.compile(r"^/(\d+)/(\d+)/(\d+)\.png$")
+
+# Zoomstufe der Karte in der App (zoom_start=15) ± 2
+PREFETCH_ZOOMS = range(13, 18)
+
+
+class TileCache:
+    """
+    Fetch tiles through a `DiskLRUCache`, revalidating entries older than `max_age`.
+    """
+
+    def __init__(self, cache, upstream_url, user_agent, max_age=7 * 24 * 3600, timeout=10):
+        self.cache = cache
+        self.upstream_url = upstream_url
+        self.max_age = max_age
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = user_agent
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            DiskLRUCache(settings.TILE_CACHE_DIR, settings.TILE_CACHE_MAX_BYTES),
+            upstream_url=settings.TILE_UPSTREAM_URL,
+            user_agent=settings.NOMINATIM_USER_AGENT,
+            max_age=settings.TILE_CACHE_MAX_AGE,
+        )
+
+    def get_tile(self, z, x, y):
+        """
+        Return the PNG bytes of a tile, from the cache whenever possible.
+        """
+        key = f"{z}/{x}/{y}"
+        cached = self.cache.get(key)
+        if cached is not None:
+            data, metadata = cached
+            if time.time() - metadata.get("fetched_at", 0) < self.max_age:
+                return data
+
+        headers = {}
+        if cached is not None:
+            if metadata.get("etag"):
+                headers["If-None-Match"] = metadata["etag"]
+            if metadata.get("last_modified"):
+                headers["If-Modified-Since"] = metadata["last_modified"]
+
+        url = self.upstream_url.format(z=z, x=x, y=y, s="a")
+        try:
+            with external_call("tiles"):
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and cached is not None:
+                metadata["fetched_at"] = time.time()
+                self._store(self.cache.update_metadata, key, metadata)
+                return data
+            response.raise_for_status()
+        except requests.RequestException:
+            # Upstream nicht erreichbar: veraltete Kachel ist besser als keine
+            if cached is not None:
+                return data
+            raise
+
+        self._store(self.cache.put, key, response.content, {
+            "fetched_at": time.time(),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        })
+        return response.content
+
+    def _store(self, write, key, *args):
+        # Eine nicht speicherbare Kachel (z.B. Festplatte voll) trotzdem ausliefern
+        try:
+            write(key, *args)
+        except OSError as e:
+            logger.warning("Kachel %s konnte nicht gespeichert werden: %s", key, e)
+
+    def is_fresh(self, z, x, y):
+        """Whether the tile is cached and younger than `max_age`."""
+        cached = self.cache.get(f"{z}/{x}/{y}")
+        return cached is not None and time.time() - cached[1].get("fetched_at", 0) < self.max_age
+
+    def prefetch(self, latitude, longitude, zooms=PREFETCH_ZOOMS, width=700, height=400, workers=2):
+        """
+        Load all tiles covering a `width` x `height` map around a point for
+        each zoom level into the cache. Tiles that are already fresh are
+        skipped; returns the number of tiles fetched.
+        """
+        tiles = []
+        for z in zooms:
+            center_x, center_y = tile_position(latitude, longitude, z)
+            n = 2 ** z
+            half_x = width / 2 / TILE_SIZE
+            half_y = height / 2 / TILE_SIZE
+            for y in range(int(center_y - half_y), int(center_y + half_y) + 1):
+                if not 0 <= y < n:
+                    continue
+                for x in range(int(center_x - half_x), int(center_x + half_x) + 1):
+                    tiles.append((z, x % n, y))
+
+        tiles = [tile for tile in tiles if not self.is_fresh(*tile)]
+        if not tiles:
+            return 0
+        # Wenige parallele Downloads, um den Upstream nicht zu überlasten
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in [executor.submit(self.get_tile, *tile) for tile in tiles]:
+                try:
+                    future.result()
+                except requests.RequestException:
+                    pass
+        return len(tiles)
+
+
+class _TileRequestHandler(BaseHTTPRequestHandler):
+    tiles = None
+
+    def do_GET(self):
+        match = _TILE_PATH.match(self.path.split("?", 1)[0])
+        if not match:
+            self.send_error(404)
+            return
+        z, x, y = (int(part) for part in match.groups())
+        if x >= 2 ** z or y >= 2 ** z:
+            self.send_error(404)
+            return
+        try:
+            data = self.tiles.get_tile(z, x, y)
+        except requests.RequestException:
+            self.send_error(502)
+            return
+        except Exception:
+            logger.exception("Kachel %d/%d/%d konnte nicht geladen werden", z, x, y)
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Cache-Control", "public, max-age=86400")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_tile_proxy(tiles, host="127.0.0.1", port=0):
+    """
+    Serve `tiles` over HTTP in a daemon thread and return the server.
+    """
+    handler = type("TileRequestHandler", (_TileRequestHandler,), {"tiles": tiles})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="tile-proxy", daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lokaler Cache-Proxy für OpenStreetMap-Kacheln")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve = subparsers.add_parser("serve", help="Proxy starten")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+
+    prefetch = subparsers.add_parser("prefetch", help="Kacheln um einen Punkt vorladen")
+    prefetch.add_argument("latitude", type=float)
+    prefetch.add_argument("longitude", type=float)
+
+    args = parser.parse_args(argv)
+    tiles = TileCache.from_settings()
+    if args.command == "prefetch":
+        count = tiles.prefetch(args.latitude, args.longitude)
+        print(f"{count} Kacheln vorgeladen")
+        return 0
+
+    server = start_tile_proxy(tiles, args.host, args.port)
+    print(f"Kachel-Proxy läuft auf http://{args.host}:{server.server_port}/{{z}}/{{x}}/{{y}}.png")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())